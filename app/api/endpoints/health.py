@@ -1,14 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request, Response
 from app.models.schemas import HealthResponse
-from app.core.config import get_settings, Settings
 
 router = APIRouter()
 
 
 @router.get("/health", response_model=HealthResponse, status_code=200)
-async def health_check(settings: Settings = Depends(get_settings)) -> HealthResponse:
-    """Health check endpoint."""
-    return HealthResponse(
-        app_name=settings.app_name,
-        version=settings.app_version
-    ) 
\ No newline at end of file
+async def health_check(request: Request) -> Response:
+    """Health check endpoint serving the JSON body pre-encoded at startup."""
+    return Response(
+        content=request.app.state.health_body,
+        media_type="application/json"
+    )
\ No newline at end of file
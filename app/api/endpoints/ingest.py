@@ -1,126 +1,178 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form
+import asyncio
+from typing import AsyncIterator, Tuple
+import aiofiles
+import aiofiles.os
+import aiofiles.tempfile
+from fastapi import APIRouter, HTTPException, Request, Response, status, UploadFile, File, Form
 from app.models.schemas import IngestRequest, IngestResponse
-from app.services.document_service import DocumentService
-from app.services.observability_service import ObservabilityService
-from app.core.dependencies import get_document_service, get_observability_service
+from app.core.dependencies import json_body_schema, json_response, parse_json_body, require_document_service
 
 router = APIRouter()
 
 
-@router.post("/ingest", response_model=IngestResponse, status_code=201)
-async def ingest_document(
-    request: IngestRequest,
-    document_service: DocumentService = Depends(get_document_service),
-    observability_service: ObservabilityService = Depends(get_observability_service)
-) -> IngestResponse:
+def _queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Ingestion queue is full, retry later",
+        headers={"Retry-After": "5"}
+    )
+
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB per read
+
+# Every casing of ".pdf"; endswith() with a tuple checks them without copying the filename
+PDF_SUFFIXES = (".pdf", ".PDF", ".Pdf", ".pDf", ".pdF", ".PDf", ".PdF", ".pDF")
+PDF_MAGIC = b"%PDF"
+# PDF readers accept the header anywhere in the first KiB (after a BOM or other leading junk)
+PDF_HEADER_SEARCH_SIZE = 1024
+
+
+async def _iter_upload(file: UploadFile, size: int) -> AsyncIterator[bytes]:
+    """Yield the uploaded file in fixed-size blocks."""
+    while chunk := await file.read(size):
+        yield chunk
+
+
+async def _save_upload(file: UploadFile, head: bytes = b"") -> Tuple[str, int]:
+    """Stream an upload to a temporary file on disk, returning its path and size in bytes.
+    
+    ``head`` holds any bytes already read from the upload and is written first.
+    """
+    total = len(head)
+    async with aiofiles.tempfile.NamedTemporaryFile("wb", delete=False, suffix=".pdf") as tmp:
+        try:
+            await tmp.write(head)
+            async for chunk in _iter_upload(file, UPLOAD_CHUNK_SIZE):
+                await tmp.write(chunk)
+                total += len(chunk)
+        except BaseException:
+            await aiofiles.os.remove(tmp.name)
+            raise
+    return tmp.name, total
+
+
+@router.post(
+    "/ingest",
+    response_model=IngestResponse,
+    status_code=201,
+    openapi_extra=json_body_schema(IngestRequest)
+)
+async def ingest_document(http_request: Request) -> Response:
     """
     Ingest a document from text content or URL.
     
     Supports text, HTML, markdown, and PDF URLs.
     """
-    # Log incoming request
-    observability_service.log_request("/ingest", {
-        "document_type": request.document_type,
-        "content_length": len(request.content),
-        "has_content": bool(request.content.strip())
-    })
+    request = await parse_json_body(http_request, IngestRequest)
     
-    try:
-        if not request.content.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Content cannot be empty"
-            )
-        
-        result = await document_service.ingest_document(
-            content=request.content,
-            document_type=request.document_type
-        )
-        
-        # Log successful response
-        observability_service.log_response("/ingest", 201, len(str(result.dict())))
-        
-        return result
-    
-    except HTTPException as e:
-        # Log HTTP error
-        observability_service.log_response("/ingest", e.status_code, len(str(e.detail)))
-        raise
-    except Exception as e:
-        # Log internal error
-        observability_service.log_response("/ingest", 500, len(str(e)))
+    # isspace() stops at the first non-whitespace character and, unlike strip(), copies nothing
+    if not request.content or request.content.isspace():
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal server error: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Content cannot be empty"
         )
+    
+    document_service = require_document_service(http_request)
+    
+    if document_service.settings.async_ingestion:
+        try:
+            queued = document_service.queue_document(
+                content=request.content,
+                document_type=request.document_type
+            )
+        except asyncio.QueueFull:
+            raise _queue_full()
+        return json_response(queued, status_code=202)
+    
+    result = await document_service.ingest_document(
+        content=request.content,
+        document_type=request.document_type
+    )
+    return json_response(result, status_code=201)
 
 
 @router.post("/ingest/file", response_model=IngestResponse, status_code=201)
 async def ingest_file(
+    http_request: Request,
     file: UploadFile = File(..., description="PDF file to upload"),
-    document_type: str = Form(default="pdf", description="Document type"),
-    document_service: DocumentService = Depends(get_document_service),
-    observability_service: ObservabilityService = Depends(get_observability_service)
-) -> IngestResponse:
+    document_type: str = Form(default="pdf", description="Document type")
+) -> Response:
     """
     Ingest a document from file upload.
     
     Currently supports PDF files only.
     """
-    # Log incoming file upload request
-    observability_service.log_request("/ingest/file", {
+    if not file.filename or not file.filename.endswith(PDF_SUFFIXES):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only PDF files are supported for file upload"
+        )
+    
+    if document_type != "pdf":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File upload only supports PDF document type"
+        )
+    
+    document_service = require_document_service(http_request)
+    
+    # Reject non-PDF content from its magic number before reading the rest of the upload
+    head = await file.read(PDF_HEADER_SEARCH_SIZE)
+    if not head:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded file is empty"
+        )
+    
+    if PDF_MAGIC not in head:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded file is not a valid PDF"
+        )
+    
+    file_path, file_size = await _save_upload(file, head)
+    
+    http_request.app.state.observability_service.log_metrics("file_upload", {
         "filename": file.filename,
-        "document_type": document_type,
-        "content_type": file.content_type
+        "file_size": file_size,
+        "document_type": document_type
     })
     
-    try:
-        if not file.filename or not file.filename.lower().endswith('.pdf'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Only PDF files are supported for file upload"
-            )
-        
-        if document_type != "pdf":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File upload only supports PDF document type"
-            )
-        
-        file_content = await file.read()
-        
-        # Add file size to observability
-        observability_service.log_metrics("file_upload", {
-            "filename": file.filename,
-            "file_size": len(file_content),
-            "document_type": document_type
-        })
-        
-        if not file_content:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Uploaded file is empty"
+    if document_service.settings.async_ingestion:
+        # The queued job owns the temporary file from here on
+        try:
+            queued = document_service.queue_file_path(
+                file_path=file_path,
+                filename=file.filename,
+                document_type=document_type,
+                file_size=file_size
             )
-        
-        result = await document_service.ingest_file(
-            file_content=file_content,
-            filename=file.filename or "uploaded_file.pdf",
-            document_type=document_type
-        )
-        
-        # Log successful response
-        observability_service.log_response("/ingest/file", 201, len(str(result.dict())))
-        
-        return result
+        except asyncio.QueueFull:
+            await aiofiles.os.remove(file_path)
+            raise _queue_full()
+        return json_response(queued, status_code=202)
     
-    except HTTPException as e:
-        # Log HTTP error
-        observability_service.log_response("/ingest/file", e.status_code, len(str(e.detail)))
-        raise
-    except Exception as e:
-        # Log internal error
-        observability_service.log_response("/ingest/file", 500, len(str(e)))
+    try:
+        result = await document_service.ingest_file_path(
+            file_path=file_path,
+            filename=file.filename,
+            document_type=document_type,
+            file_size=file_size
+        )
+        return json_response(result, status_code=201)
+    finally:
+        await aiofiles.os.remove(file_path)
+
+
+@router.get("/ingest/status/{job_id}", response_model=IngestResponse, status_code=200)
+async def ingest_status(job_id: str, http_request: Request) -> Response:
+    """
+    Get the status of a background ingestion job.
+    """
+    document_service = require_document_service(http_request)
+    job = document_service.get_job(job_id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal server error: {str(e)}"
-        ) 
\ No newline at end of file
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingestion job '{job_id}' not found"
+        )
+    return json_response(job)
@@ -1,56 +1,76 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Any, AsyncIterator, Dict
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from app.models.schemas import QueryRequest, QueryResponse
-from app.services.document_service import DocumentService
-from app.services.observability_service import ObservabilityService
-from app.core.dependencies import get_document_service, get_observability_service
+from app.core.dependencies import json_body_schema, json_response, parse_json_body, require_document_service
 
 router = APIRouter()
 
 
-@router.post("/query", response_model=QueryResponse, status_code=200)
-async def query_documents(
-    request: QueryRequest,
-    document_service: DocumentService = Depends(get_document_service),
-    observability_service: ObservabilityService = Depends(get_observability_service)
-) -> QueryResponse:
+def _validate_question(question: str):
+    if not question or question.isspace():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="empty question"
+        )
+
+
+async def _server_sent_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode answer events as text/event-stream messages named after their single key."""
+    async for event in events:
+        name, data = next(iter(event.items()))
+        yield b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+        if name == "error":
+            return
+    yield b"event: done\ndata: {}\n\n"
+
+
+@router.post(
+    "/query",
+    response_model=QueryResponse,
+    status_code=200,
+    openapi_extra=json_body_schema(QueryRequest)
+)
+async def query_documents(http_request: Request) -> Response:
     """
     Query documents using RAG (Retrieval-Augmented Generation) with observability.
     """
-    # Log incoming query request
-    observability_service.log_request("/query", {
+    request = await parse_json_body(http_request, QueryRequest)
+    _validate_question(request.question)
+    
+    document_service = require_document_service(http_request)
+    result = await document_service.query_documents(
+        question=request.question
+    )
+    
+    http_request.app.state.observability_service.log_metrics("query_response", {
         "question_length": len(request.question),
-        "has_question": bool(request.question.strip())
+        "answer_length": len(result.answer),
+        "sources_count": len(result.sources)
     })
     
-    try:
-        if not request.question.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="empty question"
-            )
-        
-        result = await document_service.query_documents(
-            question=request.question
-        )
-        
-        # Log successful response with metrics
-        observability_service.log_response("/query", 200, len(str(result.dict())))
-        observability_service.log_metrics("query_response", {
-            "question_length": len(request.question),
-            "answer_length": len(result.answer),
-            "sources_count": len(result.sources)
-        })
-        
-        return result
+    return json_response(result)
+
+
+@router.post(
+    "/query/stream",
+    status_code=200,
+    openapi_extra=json_body_schema(QueryRequest),
+    response_class=StreamingResponse
+)
+async def query_documents_stream(http_request: Request) -> StreamingResponse:
+    """
+    Query documents and stream the answer as server-sent events.
     
-    except HTTPException as e:
-        # Log HTTP error
-        observability_service.log_response("/query", e.status_code, len(str(e.detail)))
-        raise
-    except Exception as e:
-        # Log internal error
-        observability_service.log_response("/query", 500, len(str(e)))
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal server error: {str(e)}"
-        ) 
\ No newline at end of file
+    Sends one ``sources`` event, then ``delta`` events with answer text as it is
+    generated, and finally ``done`` (or ``error`` if the query failed).
+    """
+    request = await parse_json_body(http_request, QueryRequest)
+    _validate_question(request.question)
+    
+    document_service = require_document_service(http_request)
+    return StreamingResponse(
+        _server_sent_events(document_service.query_documents_stream(request.question)),
+        media_type="text/event-stream"
+    )
\ No newline at end of file
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 
@@ -6,24 +7,57 @@ class Settings(BaseSettings):
     app_name: str = "RAG Microservice"
     app_version: str = "1.0.0"
     debug: bool = False
+    keep_alive_timeout: int = 75
     
     # OpenAI Configuration
     openai_api_key: str = ""
     openai_model: str = "gpt-4o-mini"
     openai_embedding_model: str = "text-embedding-3-small"
+    openai_embedding_dimensions: int = 0
+    openai_keepalive_expiry: int = 30
+    embedding_concurrency: int = 8
+    embedding_max_attempts: int = 6
+    embedding_batch_max_rows: int = 2048
+    embedding_batch_max_wait_ms: int = 50
+    embedding_batch_max_tokens: int = 250000
+    embedding_cache_size: int = 10000
+    embedding_cache_dir: str = ""
     
     # Vector Database Configuration
     chroma_persist_directory: str = "./chroma_db"
     collection_name: str = "documents"
+    search_batch_max_queries: int = 32
+    search_batch_max_wait_ms: int = 10
+    vector_store_batch_size: int = 1000
     
     # Document Processing Configuration
     chunk_size: int = 500
     chunk_overlap: int = 100
+    parse_workers: int = 0
+    pdf_pages_per_worker: int = 8
+    pdf_engine: Literal["pymupdf", "pdfplumber"] = "pymupdf"
+    pdf_cache_dir: str = ""
+    pdf_cache_size_mb: int = 1024
+    
+    # Background Ingestion Configuration
+    async_ingestion: bool = False
+    ingest_workers: int = 2
+    ingest_queue_size: int = 100
+    ingest_drain_timeout: int = 30
+    
+    # Query Cache Configuration
+    query_cache_size: int = 1024
+    query_cache_ttl: int = 300
+    query_semantic_threshold: float = 0.0
+    llm_cache_size: int = 1024
     
     # Langfuse Observability Configuration
     langfuse_secret_key: str = ""
     langfuse_public_key: str = ""
     langfuse_host: str = "https://cloud.langfuse.com"
+    observability_queue_size: int = 10000
+    observability_metrics: bool = True
+    log_json: bool = False
     
     class Config:
         env_file = ".env"
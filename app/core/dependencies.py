@@ -1,23 +1,59 @@
-from functools import lru_cache
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, Type, TypeVar
 
-from app.core.config import get_settings
+from fastapi import HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 
 if TYPE_CHECKING:
     from app.services.document_service import DocumentService
-    from app.services.observability_service import ObservabilityService
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
-@lru_cache()
-def get_observability_service() -> "ObservabilityService":
-    from app.services.observability_service import ObservabilityService
-    settings = get_settings()
-    return ObservabilityService(settings)
 
+def require_document_service(request: Request) -> "DocumentService":
+    """Return the application's DocumentService, or fail with 503 when it could not be built."""
+    document_service = request.app.state.document_service
+    if document_service is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Document service unavailable: OpenAI API key not set"
+        )
+    return document_service
 
-@lru_cache()
-def get_document_service() -> "DocumentService":
-    from app.services.document_service import DocumentService
-    settings = get_settings()
-    observability_service = get_observability_service()
-    return DocumentService(settings, observability_service) 
\ No newline at end of file
+
+def json_body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAPI requestBody for routes that decode their JSON body with parse_json_body."""
+    return {
+        "requestBody": {
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+            "required": True
+        }
+    }
+
+
+async def parse_json_body(request: Request, model: Type[ModelT]) -> ModelT:
+    """Validate the raw request body straight from JSON bytes with pydantic-core.
+    
+    This skips the stdlib json.loads + dict round trip FastAPI does for body
+    parameters while keeping the same 422 error format.
+    """
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])}
+            for error in e.errors(include_url=False)
+        ])
+
+
+def json_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize an already-validated model in one pydantic-core pass.
+    
+    Returning a Response skips FastAPI's response_model re-validation; routes
+    keep response_model only for the OpenAPI schema.
+    """
+    return Response(
+        content=model.model_dump_json(),
+        media_type="application/json",
+        status_code=status_code
+    )
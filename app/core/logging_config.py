@@ -0,0 +1,91 @@
+import atexit
+import copy
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import orjson
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+# Attributes every LogRecord has; anything else on a record came from ``extra=``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler that keeps a record's traceback in ``exc_text`` instead of folding it into the message.
+    
+    The stock ``prepare`` merges the traceback into ``msg`` and clears
+    ``exc_info``/``exc_text``, which would leave the listener's formatter
+    nothing to put in a separate exception field.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # Rendered here, since traceback objects should not outlive the logging call
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including their ``extra=`` fields.
+    
+    Runs on the listener thread, so the encoding cost stays off the request path.
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def configure_logging(level: int = logging.INFO, json_format: bool = False):
+    """Configure root logging so callers enqueue records and a listener thread writes them.
+    
+    Application code only pays for a queue put per record; the actual
+    write to stderr happens on the QueueListener thread. With ``json_format``
+    records are written as JSON lines that keep their structured fields.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JSONFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+    
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.handlers = [StructuredQueueHandler(log_queue)]
+    root_logger.setLevel(level)
+    
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write any queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
\ No newline at end of file
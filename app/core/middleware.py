@@ -0,0 +1,65 @@
+from typing import Iterable
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Probes and documentation; logging them would only add volume (two events per liveness probe)
+UNLOGGED_PATHS = frozenset({"/", "/api/v1/health", "/openapi.json", "/docs", "/redoc"})
+
+
+class ObservabilityMiddleware:
+    """ASGI middleware that logs HTTP requests and their responses through ObservabilityService.
+    
+    Requests to ``skip_paths`` (health checks, the root page and API docs by default) pass straight through.
+    """
+    
+    def __init__(self, app: ASGIApp, skip_paths: Iterable[str] = UNLOGGED_PATHS):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        observability_service = getattr(scope["app"].state, "observability_service", None)
+        if observability_service is None:
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
+        content_length = next(
+            (value for key, value in scope["headers"] if key == b"content-length"), b"0"
+        )
+        observability_service.log_request(path, {
+            "method": scope["method"],
+            "content_length": int(content_length)
+        })
+        
+        status_code = 500
+        response_size = 0
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            observability_service.log_response(path, status_code, response_size)
+
+
+async def internal_error_handler(request: Request, exc: Exception) -> ORJSONResponse:
+    """Turn unhandled exceptions into the service's standard 500 response."""
+    observability_service = getattr(request.app.state, "observability_service", None)
+    if observability_service is not None:
+        observability_service.log_error(request.scope["path"], exc)
+    
+    return ORJSONResponse(
+        status_code=500,
+        content={"detail": f"Internal server error: {str(exc)}"}
+    )
\ No newline at end of file
@@ -0,0 +1,23 @@
+from typing import Type, TypeVar
+import httpx
+import openai
+from app.core.config import Settings
+
+ClientT = TypeVar("ClientT", bound=openai.AsyncOpenAI)
+
+
+def create_async_openai(settings: Settings, client_class: Type[ClientT] = openai.AsyncOpenAI) -> ClientT:
+    """Create an AsyncOpenAI client whose pooled connections survive idle gaps.
+    
+    httpx drops idle connections after 5 seconds by default, so sporadic queries
+    would pay a fresh TCP and TLS handshake almost every time.
+    """
+    limits = httpx.Limits(
+        max_connections=openai.DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections=openai.DEFAULT_CONNECTION_LIMITS.max_keepalive_connections,
+        keepalive_expiry=settings.openai_keepalive_expiry
+    )
+    return client_class(
+        api_key=settings.openai_api_key,
+        http_client=openai.DefaultAsyncHttpxClient(limits=limits)
+    )
@@ -1,10 +1,20 @@
+import logging
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
+import orjson
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import get_settings, Settings
-from app.core.dependencies import get_observability_service
+from fastapi.responses import ORJSONResponse
+from app.core.config import get_settings
+from app.core.logging_config import configure_logging
+from app.core.middleware import ObservabilityMiddleware, internal_error_handler
 from app.api.router import api_router
+from app.models.schemas import HealthResponse
+from app.services.document_service import DocumentService
+from app.services.observability_service import ObservabilityService
+
+configure_logging(json_format=get_settings().log_json)
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -14,40 +24,72 @@ async def lifespan(app: FastAPI):
     
     os.makedirs(settings.chroma_persist_directory, exist_ok=True)
     
+    # The health and root payloads only depend on settings, so encode them once
+    app.state.health_body = HealthResponse(
+        app_name=settings.app_name,
+        version=settings.app_version
+    ).model_dump_json().encode()
+    app.state.root_body = orjson.dumps({
+        "message": f"Welcome to {settings.app_name}",
+        "version": settings.app_version,
+        "status": "ready",
+        "features": [
+            "Document ingestion (text, HTML, markdown, PDF)",
+            "File upload support (PDF)",
+            "Vector storage with ChromaDB",
+            "OpenAI embeddings"
+        ]
+    })
+    
     # Initialize observability service
-    observability_service = get_observability_service()
+    observability_service = ObservabilityService(settings)
+    await observability_service.start()
+    await observability_service.warmup()
+    
+    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
+    logger.info(f"Chroma DB directory: {settings.chroma_persist_directory}")
     
-    print(f"Starting {settings.app_name} v{settings.app_version}")
-    print(f"Chroma DB directory: {settings.chroma_persist_directory}")
+    # Build the process-wide services once; endpoints read them from app.state
+    app.state.observability_service = observability_service
+    app.state.document_service = None
     
     if not settings.openai_api_key:
-        print("⚠️  WARNING: OpenAI API key not set. Document ingestion will fail.")
+        logger.warning("OpenAI API key not set. Document ingestion will fail.")
+    else:
+        app.state.document_service = DocumentService(settings, observability_service)
+        await app.state.document_service.warmup()
+        await app.state.document_service.start()
     
     if settings.langfuse_secret_key and settings.langfuse_public_key:
-        print("✅ Langfuse observability enabled")
+        logger.info("Langfuse observability enabled")
         observability_service.log_metrics("application_startup", {
             "app_name": settings.app_name,
             "app_version": settings.app_version,
             "observability_enabled": True
         })
     else:
-        print("⚠️  Langfuse observability disabled (keys not provided)")
-        print("   Set LANGFUSE_SECRET_KEY and LANGFUSE_PUBLIC_KEY environment variables to enable")
+        logger.warning(
+            "Langfuse observability disabled (keys not provided). "
+            "Set LANGFUSE_SECRET_KEY and LANGFUSE_PUBLIC_KEY environment variables to enable"
+        )
     
     yield
 
-    print("Shutting down RAG Microservice...")
+    logger.info("Shutting down RAG Microservice...")
+    
+    if app.state.document_service:
+        await app.state.document_service.stop()
     
     if observability_service:
-        print("Flushing observability events...")
-        observability_service.flush()
+        logger.info("Flushing observability events...")
         observability_service.log_metrics("application_shutdown", {
             "app_name": settings.app_name,
             "graceful_shutdown": True
         })
+        await observability_service.stop()
         observability_service.flush()
     
-    print("Shutdown complete")
+    logger.info("Shutdown complete")
 
 
 def create_app() -> FastAPI:
@@ -58,6 +100,7 @@ def create_app() -> FastAPI:
         title=settings.app_name,
         version=settings.app_version,
         description="A Python-based Retrieval-Augmented Generation (RAG) microservice",
+        default_response_class=ORJSONResponse,
         lifespan=lifespan
     )
 
@@ -68,6 +111,8 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(ObservabilityMiddleware)
+    app.add_exception_handler(Exception, internal_error_handler)
     
     app.include_router(api_router, prefix="/api/v1")
     
@@ -78,18 +123,8 @@ app = create_app()
 
 
 @app.get("/")
-async def root(settings: Settings = Depends(get_settings)):
-    return {
-        "message": f"Welcome to {settings.app_name}",
-        "version": settings.app_version,
-        "status": "ready",
-        "features": [
-            "Document ingestion (text, HTML, markdown, PDF)",
-            "File upload support (PDF)",
-            "Vector storage with ChromaDB",
-            "OpenAI embeddings"
-        ]
-    }
+async def root(request: Request):
+    return Response(content=request.app.state.root_body, media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -99,5 +134,7 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.debug
+        reload=settings.debug,
+        ws="none",
+        timeout_keep_alive=settings.keep_alive_timeout
     ) 
\ No newline at end of file
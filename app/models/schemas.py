@@ -2,6 +2,13 @@ from typing import Literal, Optional, List
 from pydantic import BaseModel, Field
 
 
+# pydantic-core validates string literals with a single hash lookup in Rust
+DocumentType = Literal["pdf", "text", "html", "markdown"]
+
+# Characters of a source passage returned with an answer
+SOURCE_PREVIEW_LENGTH = 200
+
+
 class HealthResponse(BaseModel):
     status: str = "ok"
     app_name: str
@@ -10,16 +17,17 @@ class HealthResponse(BaseModel):
 
 class IngestRequest(BaseModel):
     content: str = Field(..., description="Document content or URL to ingest")
-    document_type: Literal["pdf", "text", "html", "markdown"] = Field(
+    document_type: DocumentType = Field(
         ..., description="Type of document being ingested"
     )
 
 
 class IngestResponse(BaseModel):
-    status: Literal["success", "error"]
+    status: Literal["success", "error", "queued", "running"]
     message: str
     chunks_created: int = Field(ge=0, description="Number of chunks created from the document")
     document_info: Optional[dict] = Field(None, description="Additional document information")
+    job_id: Optional[str] = Field(None, description="Background ingestion job id (async ingestion only)")
 
 
 class QueryRequest(BaseModel):
@@ -30,6 +38,17 @@ class Source(BaseModel):
     page: Optional[int] = Field(None, description="Page number (for PDFs)")
     text: str = Field(..., description="Source text passage")
     
+    @staticmethod
+    def data_from_chunk(chunk: dict) -> dict:
+        """Source fields for a similarity search hit, with the text preview truncated.
+        
+        Returned as a plain dict so a whole QueryResponse is validated in one pass.
+        """
+        text = chunk.get("text") or ""
+        if len(text) > SOURCE_PREVIEW_LENGTH:
+            text = text[:SOURCE_PREVIEW_LENGTH] + "..."
+        return {"page": chunk.get("metadata", {}).get("page"), "text": text}
+    
 
 class QueryResponse(BaseModel):
     answer: str = Field(..., description="Generated answer")
@@ -1,11 +1,39 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import aiofiles.os
+from async_lru import alru_cache
+from langchain_core.documents import Document
 from app.core.config import Settings
 from app.models.schemas import IngestResponse, QueryResponse, Source
 from app.utils.document_loader import DocumentLoader
-from app.utils.text_splitter import SmartTextSplitter
+from app.utils.pdf_cache import PdfTextCache
+from app.utils.pdf_processing import extract_pdf, extract_pdf_page_range, extract_short_pdf, parse_and_split_pdf, split_pdf_pages
+from app.utils.query_cache import QueryCacheKey
+from app.utils.semantic_cache import SemanticCache
+from app.utils.text_splitter import ChunkList, SmartTextSplitter
 from app.services.embedding_service import EmbeddingService
 from app.services.vector_service import VectorService
 from app.services.llm_service import LLMService
 
+logger = logging.getLogger(__name__)
+
+# Number of background ingestion jobs whose status is remembered
+MAX_TRACKED_JOBS = 10000
+
+# Seconds each service gets to warm up before startup carries on without it
+WARMUP_TIMEOUT = 5
+
+# Statuses of jobs that have not finished yet; these are never forgotten
+PENDING_JOB_STATUSES = ("queued", "running")
+
+IngestJob = Callable[[], Awaitable[IngestResponse]]
+
 
 class DocumentService:
     """Main service for document processing with comprehensive Langfuse observability."""
@@ -13,6 +41,7 @@ class DocumentService:
     def __init__(self, settings: Settings, observability_service=None):
         self.settings = settings
         self.observability_service = observability_service
+        self._metrics_enabled = bool(observability_service and observability_service.metrics_enabled)
         
         # Initialize all services with observability
         self.document_loader = DocumentLoader()
@@ -20,9 +49,232 @@ class DocumentService:
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap
         )
-        self.embedding_service = EmbeddingService(settings, observability_service)
-        self.vector_service = VectorService(settings, observability_service)
         self.llm_service = LLMService(settings, observability_service)
+        # Embeddings reuse the LLM's client, so both share one HTTP connection pool
+        self.embedding_service = EmbeddingService(settings, observability_service, client=self.llm_service.client)
+        self.vector_service = VectorService(settings, observability_service)
+        
+        # PDF parsing and chunking are CPU-bound; worker processes let uploads use every core.
+        # Spawned rather than forked so children do not inherit the app's threads and locks.
+        self._parse_workers = settings.parse_workers or os.cpu_count() or 1
+        self._parse_pool = ProcessPoolExecutor(
+            max_workers=self._parse_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        # Page texts of PDFs already extracted, so re-uploads skip straight to chunking
+        self._pdf_cache = PdfTextCache(
+            settings.pdf_cache_dir,
+            size_limit=settings.pdf_cache_size_mb << 20
+        ) if settings.pdf_cache_dir else None
+        
+        # Identical questions are answered from memory; errors raise out of the
+        # pipeline so they are never cached. Cleared whenever new chunks are stored.
+        self._cached_query = alru_cache(
+            maxsize=settings.query_cache_size,
+            ttl=settings.query_cache_ttl
+        )(self._run_cached_query)
+        # Bumped on every clear; answers computed against an older corpus are keyed
+        # by their old generation, so they are never served after the clear
+        self._query_generation = 0
+        # Reworded questions whose embeddings are near-identical reuse the earlier answer
+        self._semantic_cache = SemanticCache(
+            max_entries=settings.query_cache_size,
+            threshold=settings.query_semantic_threshold,
+            ttl=settings.query_cache_ttl
+        ) if settings.query_cache_size > 0 and settings.query_semantic_threshold else None
+        
+        self.jobs: "OrderedDict[str, IngestResponse]" = OrderedDict()
+        # Bounded, since every waiting upload holds a temporary file on disk
+        self._ingest_queue: "asyncio.Queue[Tuple[str, IngestJob]]" = asyncio.Queue(maxsize=settings.ingest_queue_size)
+        self._ingest_workers: List[asyncio.Task] = []
+    
+    async def start(self):
+        """Start the background ingestion workers when async ingestion is enabled."""
+        if self.settings.async_ingestion and not self._ingest_workers:
+            self._ingest_workers = [
+                asyncio.create_task(self._ingest_worker())
+                for _ in range(self.settings.ingest_workers)
+            ]
+    
+    async def stop(self):
+        """Finish queued ingestion jobs, then stop the workers, the parsing pool and the OpenAI client."""
+        if self._ingest_workers:
+            # Bounded, so one hung job (a stalled fetch or embedding call) cannot hold
+            # shutdown until the orchestrator kills the process
+            try:
+                await asyncio.wait_for(self._ingest_queue.join(), self.settings.ingest_drain_timeout)
+            except asyncio.TimeoutError:
+                pending = [job_id for job_id, job in self.jobs.items() if job.status in PENDING_JOB_STATUSES]
+                logger.warning(
+                    f"Cancelling ingestion jobs still pending after {self.settings.ingest_drain_timeout}s: {', '.join(pending)}",
+                    extra={"job_ids": pending}
+                )
+            for worker in self._ingest_workers:
+                worker.cancel()
+            await asyncio.gather(*self._ingest_workers, return_exceptions=True)
+            self._ingest_workers = []
+        
+        await asyncio.to_thread(self._parse_pool.shutdown)
+        await self.llm_service.client.close()
+    
+    async def _ingest_worker(self):
+        """Run queued ingestion jobs and record their results."""
+        while True:
+            job_id, job = await self._ingest_queue.get()
+            self.jobs[job_id] = self.jobs[job_id].model_copy(update={
+                "status": "running",
+                "message": "Document is being ingested"
+            })
+            try:
+                result = await job()
+            except Exception as e:
+                result = IngestResponse(
+                    status="error",
+                    message=f"Failed to ingest document: {str(e)}",
+                    chunks_created=0,
+                    document_info=None
+                )
+            finally:
+                self._ingest_queue.task_done()
+            self.jobs[job_id] = result.model_copy(update={"job_id": job_id})
+            # Finished jobs are kept in completion order, so the oldest results are forgotten first
+            self.jobs.move_to_end(job_id)
+    
+    def _forget_finished_jobs(self):
+        """Drop the oldest finished jobs beyond MAX_TRACKED_JOBS; queued and running jobs are kept."""
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            # Only pending jobs can precede the oldest finished one, and at most the queue size plus workers are pending
+            finished = next((job_id for job_id, job in self.jobs.items() if job.status not in PENDING_JOB_STATUSES), None)
+            if finished is None:
+                return
+            del self.jobs[finished]
+    
+    def _queue_job(self, job: IngestJob) -> IngestResponse:
+        """Queue an ingestion job and return its initial status.
+        
+        Raises asyncio.QueueFull when INGEST_QUEUE_SIZE jobs are already waiting.
+        """
+        job_id = uuid.uuid4().hex
+        self._ingest_queue.put_nowait((job_id, job))
+        
+        queued = IngestResponse(
+            status="queued",
+            message="Document queued for ingestion",
+            chunks_created=0,
+            document_info=None,
+            job_id=job_id
+        )
+        # Recorded before the worker can pick the job up, since put_nowait does not yield
+        self.jobs[job_id] = queued
+        self._forget_finished_jobs()
+        return queued
+    
+    def get_job(self, job_id: str) -> Optional[IngestResponse]:
+        """Return the latest status of a background ingestion job."""
+        return self.jobs.get(job_id)
+    
+    def queue_document(self, content: str, document_type: str) -> IngestResponse:
+        """Ingest a document from text content or URL in the background."""
+        return self._queue_job(lambda: self.ingest_document(content, document_type))
+    
+    def queue_file_path(self, file_path: str, filename: str, document_type: str, file_size: int) -> IngestResponse:
+        """Ingest an uploaded file in the background; the job removes the file when done."""
+        async def job() -> IngestResponse:
+            try:
+                return await self.ingest_file_path(file_path, filename, document_type, file_size)
+            finally:
+                await aiofiles.os.remove(file_path)
+        
+        return self._queue_job(job)
+    
+    async def warmup(self):
+        """Open downstream connections at startup so the first request does not pay for them."""
+        services = {
+            "embedding": self.embedding_service,
+            "vector": self.vector_service,
+            "llm": self.llm_service
+        }
+        # Bounded, so an unreachable or slow dependency (with the SDK's long timeouts
+        # and retries) cannot hold up startup and fail readiness checks
+        results = await asyncio.gather(
+            *(asyncio.wait_for(service.warmup(), WARMUP_TIMEOUT) for service in services.values()),
+            return_exceptions=True
+        )
+        for name, result in zip(services, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"{name} service warmup timed out after {WARMUP_TIMEOUT}s")
+            elif isinstance(result, Exception):
+                logger.warning(f"{name} service warmup failed: {result}")
+    
+    def _load_and_split(self, content: str, document_type: str) -> Tuple[Document, ChunkList]:
+        """Load and chunk a document; blocking, so it runs in a worker thread."""
+        document = self.document_loader.load_document(content, document_type)
+        return document, self.text_splitter.split_document(document)
+    
+    async def _load_and_split_pdf(self, file_path: str, metadata: dict) -> Tuple[Document, ChunkList]:
+        """Parse and chunk a PDF on disk in the parsing process pool.
+        
+        Long PDFs are split into page ranges extracted by several workers at once.
+        """
+        loop = asyncio.get_running_loop()
+        pages_per_worker = self.settings.pdf_pages_per_worker
+        
+        engine = self.settings.pdf_engine
+        
+        cache_key = None
+        if self._pdf_cache is not None:
+            cache_key = await self._pdf_cache.key(file_path, engine)
+            cached = await self._pdf_cache.get(cache_key)
+            if cached is not None:
+                total_pages, page_texts = cached
+                return await self._split_pdf_pages(page_texts, total_pages, metadata)
+        
+        if not pages_per_worker:
+            if cache_key is None:
+                return await loop.run_in_executor(
+                    self._parse_pool,
+                    parse_and_split_pdf,
+                    file_path,
+                    metadata,
+                    self.settings.chunk_size,
+                    self.settings.chunk_overlap,
+                    engine
+                )
+            # Extracted separately from chunking so the page texts can be cached
+            total_pages, page_texts = await loop.run_in_executor(self._parse_pool, extract_pdf, file_path, engine)
+        else:
+            # Short PDFs are extracted by the same open that counts their pages
+            total_pages, page_texts = await loop.run_in_executor(
+                self._parse_pool, extract_short_pdf, file_path, pages_per_worker, engine
+            )
+            if page_texts is None:
+                # Ranges of at least pages_per_worker pages, at most one per worker
+                step = max(pages_per_worker, -(-total_pages // self._parse_workers))
+                page_ranges = await asyncio.gather(*(
+                    loop.run_in_executor(self._parse_pool, extract_pdf_page_range, file_path, start, start + step, engine)
+                    for start in range(0, total_pages, step)
+                ))
+                page_texts = [text for page_range in page_ranges for text in page_range]
+        
+        if cache_key is not None:
+            await self._pdf_cache.set(cache_key, total_pages, page_texts)
+        
+        return await self._split_pdf_pages(page_texts, total_pages, metadata)
+    
+    async def _split_pdf_pages(self, page_texts: List[str], total_pages: int, metadata: dict) -> Tuple[Document, ChunkList]:
+        """Chunk already extracted PDF pages in the parsing process pool."""
+        metadata.update({
+            "total_pages": total_pages,
+            "source_type": "pdf_file"
+        })
+        return await asyncio.get_running_loop().run_in_executor(
+            self._parse_pool,
+            split_pdf_pages,
+            page_texts,
+            metadata,
+            self.settings.chunk_size,
+            self.settings.chunk_overlap
+        )
     
     async def ingest_document(self, content: str, document_type: str) -> IngestResponse:
         """Ingest a document from text content or URL with full observability."""
@@ -45,11 +297,9 @@ class DocumentService:
                     document_type=document_type,
                     content_length=len(content)
                 ):
-                    document = self.document_loader.load_document(content, document_type)
-                    chunks = self.text_splitter.split_document(document)
+                    document, chunks = await asyncio.to_thread(self._load_and_split, content, document_type)
             else:
-                document = self.document_loader.load_document(content, document_type)
-                chunks = self.text_splitter.split_document(document)
+                document, chunks = await asyncio.to_thread(self._load_and_split, content, document_type)
             
             if not chunks:
                 return IngestResponse(
@@ -59,17 +309,18 @@ class DocumentService:
                     document_info=None
                 )
             
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("document_chunking", {
                     "original_length": len(document.page_content),
                     "chunks_created": len(chunks),
-                    "average_chunk_size": sum(len(chunk.text) for chunk in chunks) / len(chunks) if chunks else 0,
+                    "average_chunk_size": chunks.total_chars / len(chunks),
                     "document_type": document_type
                 })
             
-            embedding_results = await self.embedding_service.embed_chunks(chunks)
+            embedding_batch = await self.embedding_service.embed_chunks(chunks)
             
-            stored_count = await self.vector_service.store_embeddings(embedding_results)
+            stored_count = await self.vector_service.store_embeddings(embedding_batch)
+            self.clear_query_cache()
             
             document_info = {
                 "source": document.metadata.get("source", "direct_input"),
@@ -79,7 +330,7 @@ class DocumentService:
             }
             
             # Log final ingestion metrics
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("document_ingestion_complete", {
                     "chunks_created": stored_count,
                     "document_type": document_type,
@@ -94,7 +345,7 @@ class DocumentService:
             )
         
         except Exception as e:
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("document_ingestion_error", {
                     "error": str(e),
                     "document_type": document_type,
@@ -108,20 +359,20 @@ class DocumentService:
                 document_info=None
             )
     
-    async def ingest_file(self, file_content: bytes, filename: str, document_type: str) -> IngestResponse:
-        """Ingest a document from uploaded file with observability."""
+    async def ingest_file_path(self, file_path: str, filename: str, document_type: str, file_size: int) -> IngestResponse:
+        """Ingest a document from an uploaded file saved on disk with observability."""
         if self.observability_service:
             async with self.observability_service.trace_operation(
                 "file_ingestion",
                 filename=filename,
                 document_type=document_type,
-                file_size=len(file_content)
+                file_size=file_size
             ):
-                return await self._ingest_file_impl(file_content, filename, document_type)
+                return await self._ingest_file_impl(file_path, filename, document_type, file_size)
         else:
-            return await self._ingest_file_impl(file_content, filename, document_type)
+            return await self._ingest_file_impl(file_path, filename, document_type, file_size)
     
-    async def _ingest_file_impl(self, file_content: bytes, filename: str, document_type: str) -> IngestResponse:
+    async def _ingest_file_impl(self, file_path: str, filename: str, document_type: str, file_size: int) -> IngestResponse:
         """Internal implementation of file ingestion."""
         try:
             metadata = {
@@ -135,21 +386,17 @@ class DocumentService:
                     "file_processing_and_chunking",
                     filename=filename,
                     document_type=document_type,
-                    file_size=len(file_content)
+                    file_size=file_size
                 ):
                     if document_type == "pdf":
-                        document = self.document_loader.load_pdf(file_content, metadata)
+                        document, chunks = await self._load_and_split_pdf(file_path, metadata)
                     else:
                         raise ValueError(f"type: {document_type} not supported")
-                    
-                    chunks = self.text_splitter.split_document(document)
             else:
                 if document_type == "pdf":
-                    document = self.document_loader.load_pdf(file_content, metadata)
+                    document, chunks = await self._load_and_split_pdf(file_path, metadata)
                 else:
                     raise ValueError(f"type: {document_type} not supported")
-                
-                chunks = self.text_splitter.split_document(document)
             
             if not chunks:
                 return IngestResponse(
@@ -159,27 +406,28 @@ class DocumentService:
                     document_info=None
                 )
             
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("file_processing", {
                     "filename": filename,
-                    "file_size": len(file_content),
+                    "file_size": file_size,
                     "chunks_created": len(chunks),
                     "document_type": document_type,
                     "total_pages": document.metadata.get("total_pages", 0)
                 })
             
-            embedding_results = await self.embedding_service.embed_chunks(chunks)
-            stored_count = await self.vector_service.store_embeddings(embedding_results)
+            embedding_batch = await self.embedding_service.embed_chunks(chunks)
+            stored_count = await self.vector_service.store_embeddings(embedding_batch)
+            self.clear_query_cache()
             
             document_info = {
                 "filename": filename,
                 "type": document.metadata.get("type"),
                 "total_pages": document.metadata.get("total_pages"),
                 "original_length": len(document.page_content),
-                "file_size_bytes": len(file_content)
+                "file_size_bytes": file_size
             }
             
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("file_ingestion_complete", {
                     "filename": filename,
                     "chunks_stored": stored_count,
@@ -195,7 +443,7 @@ class DocumentService:
         
         except Exception as e:
             # Log error metrics
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("file_ingestion_error", {
                     "filename": filename,
                     "error": str(e),
@@ -209,6 +457,13 @@ class DocumentService:
                 document_info=None
             )
     
+    def clear_query_cache(self):
+        """Drop cached answers so newly ingested documents are taken into account."""
+        self._query_generation += 1
+        self._cached_query.cache_clear()
+        if self._semantic_cache:
+            self._semantic_cache.clear()
+    
     async def get_stats(self) -> dict:
         """Get statistics about the document store."""
         return await self.vector_service.get_collection_stats()
@@ -227,67 +482,119 @@ class DocumentService:
     
     async def _query_documents_impl(self, question: str) -> QueryResponse:
         """Internal implementation of RAG query."""
+        key = QueryCacheKey.for_question(question, self._query_generation)
+        try:
+            response = await self._cached_query(key)
+            if key.generation != self._query_generation:
+                # Cleared while this query ran; drop the entry it wrote for the old corpus
+                self._cached_query.cache_invalidate(key)
+            return response
+        
+        except Exception as e:
+            # Log error metrics
+            if self._metrics_enabled:
+                self.observability_service.log_metrics("rag_query_error", {
+                    "question": question,
+                    "error": str(e),
+                    "success": False
+                })
+            
+            return QueryResponse(
+                answer=f"An error occurred while processing your question: {str(e)}",
+                sources=[]
+            )
+    
+    async def query_documents_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """Answer a question as a sequence of events, so clients can render while the LLM writes.
+        
+        Yields ``{"sources": [...]}`` once, then ``{"delta": "..."}`` pieces of the answer;
+        a failure ends the stream with ``{"error": "..."}``.
+        """
         try:
-            # Generate question embedding
             question_embedding = await self.embedding_service.generate_embedding(question)
             
-            # Search for similar chunks
+            if self._semantic_cache:
+                cached = self._semantic_cache.get(question_embedding)
+                if cached is not None:
+                    yield {"sources": [source.model_dump() for source in cached.sources]}
+                    yield {"delta": cached.answer}
+                    return
+            
             similar_chunks = await self.vector_service.search_similar(
                 query_embedding=question_embedding,
                 top_k=5
             )
             
-            if not similar_chunks:
-                return QueryResponse(
-                    answer="I don't have any relevant documents to answer this question.",
-                    sources=[]
-                )
-            
-            # Log retrieval metrics
-            if self.observability_service:
-                self.observability_service.log_metrics("rag_retrieval", {
-                    "question_length": len(question),
-                    "chunks_retrieved": len(similar_chunks),
-                    "average_similarity": sum(1 - chunk.get("distance", 1) for chunk in similar_chunks) / len(similar_chunks) if similar_chunks else 0
-                })
-            
-            # Generate answer using LLM
-            answer = await self.llm_service.generate_answer(question, similar_chunks)
-            
-            # Prepare sources
-            sources = []
-            for chunk in similar_chunks:
-                metadata = chunk.get("metadata", {})
-                source = Source(
-                    page=metadata.get("page"),
-                    text=chunk.get("text", "")[:200] + "..." if len(chunk.get("text", "")) > 200 else chunk.get("text", "")
-                )
-                sources.append(source)
+            yield {"sources": [Source.data_from_chunk(chunk) for chunk in similar_chunks]}
             
-            # Log final query metrics
-            if self.observability_service:
-                self.observability_service.log_metrics("rag_query_complete", {
-                    "question_length": len(question),
-                    "answer_length": len(answer),
-                    "sources_returned": len(sources),
-                    "success": True
-                })
+            if not similar_chunks:
+                yield {"delta": "I don't have any relevant documents to answer this question."}
+                return
             
-            return QueryResponse(
-                answer=answer,
-                sources=sources
-            )
+            async for delta in self.llm_service.generate_answer_stream(question, similar_chunks):
+                yield {"delta": delta}
         
         except Exception as e:
-            # Log error metrics
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("rag_query_error", {
                     "question": question,
                     "error": str(e),
                     "success": False
                 })
             
+            yield {"error": f"An error occurred while processing your question: {str(e)}"}
+    
+    async def _run_cached_query(self, key: QueryCacheKey) -> QueryResponse:
+        return await self._run_query_pipeline(key.question, key.generation)
+    
+    async def _run_query_pipeline(self, question: str, generation: int) -> QueryResponse:
+        """Embed the question, retrieve similar chunks and generate the answer."""
+        # Generate question embedding
+        question_embedding = await self.embedding_service.generate_embedding(question)
+        
+        if self._semantic_cache:
+            cached = self._semantic_cache.get(question_embedding)
+            if cached is not None:
+                return cached
+        
+        # Search for similar chunks
+        similar_chunks = await self.vector_service.search_similar(
+            query_embedding=question_embedding,
+            top_k=5
+        )
+        
+        if not similar_chunks:
             return QueryResponse(
-                answer=f"An error occurred while processing your question: {str(e)}",
+                answer="I don't have any relevant documents to answer this question.",
                 sources=[]
-            ) 
\ No newline at end of file
+            )
+        
+        # Log retrieval metrics
+        if self._metrics_enabled:
+            self.observability_service.log_metrics("rag_retrieval", {
+                "question_length": len(question),
+                "chunks_retrieved": len(similar_chunks),
+                "average_similarity": sum(1 - chunk.get("distance", 1) for chunk in similar_chunks) / len(similar_chunks) if similar_chunks else 0
+            })
+        
+        answer = await self.llm_service.generate_answer(question, similar_chunks)
+        
+        sources = [Source.data_from_chunk(chunk) for chunk in similar_chunks]
+        
+        # Log final query metrics
+        if self._metrics_enabled:
+            self.observability_service.log_metrics("rag_query_complete", {
+                "question_length": len(question),
+                "answer_length": len(answer),
+                "sources_returned": len(sources),
+                "success": True
+            })
+        
+        response = QueryResponse.model_validate({
+            "answer": answer,
+            "sources": sources
+        })
+        # A clear that happened while this query ran means the answer reflects the old corpus
+        if self._semantic_cache and generation == self._query_generation:
+            self._semantic_cache.set(question_embedding, response)
+        return response
@@ -1,24 +1,59 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
 import openai
+from async_lru import alru_cache
 from app.core.config import Settings
+from app.core.openai_client import create_async_openai
+
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful assistant that answers questions based on provided context. Be concise and accurate."
+}
+
+# The user prompt is PROMPT_HEADER, the context chunks joined by CONTEXT_SEPARATOR,
+# then PROMPT_QUESTION, the question and PROMPT_ANSWER
+PROMPT_HEADER = (
+    'Based on the following context, please answer the question. If the answer cannot be found '
+    'in the context, say "I don\'t have enough information to answer this question."\n'
+    "\n"
+    "Context:\n"
+)
+CONTEXT_SEPARATOR = "\n\n"
+PROMPT_QUESTION = "\n\nQuestion: "
+PROMPT_ANSWER = "\n\nAnswer:"
+PROMPT_FIXED_LENGTH = len(PROMPT_HEADER) + len(PROMPT_QUESTION) + len(PROMPT_ANSWER)
 
 
 class LLMService:
     """Service for LLM-based question answering with Langfuse observability."""
     
-    def __init__(self, settings: Settings, observability_service=None):
+    def __init__(self, settings: Settings, observability_service=None, client: Optional[openai.AsyncOpenAI] = None):
         self.settings = settings
         self.observability_service = observability_service
+        self._metrics_enabled = bool(observability_service and observability_service.metrics_enabled)
         
         if not settings.openai_api_key:
             raise ValueError("OpenAI API key is required")
         
-        if observability_service and observability_service.get_instrumented_openai():
-            self.client = observability_service.get_instrumented_openai()
+        if client is not None:
+            self.client = client
+        elif observability_service and observability_service.get_instrumented_async_openai():
+            self.client = observability_service.get_instrumented_async_openai()
         else:
-            self.client = openai.OpenAI(api_key=settings.openai_api_key)
+            self.client = create_async_openai(settings)
         
         self.model = settings.openai_model
+        
+        # The prompt embeds the retrieved context, so unlike the query cache these
+        # entries stay valid after ingestion: a hit means the same question over the same chunks
+        if settings.llm_cache_size:
+            self._complete = alru_cache(
+                maxsize=settings.llm_cache_size,
+                ttl=settings.query_cache_ttl
+            )(self._complete)
+    
+    async def warmup(self):
+        """Establish the OpenAI connection with a metadata call that costs no tokens."""
+        await self.client.models.retrieve(self.model)
     
     async def generate_answer(self, question: str, context_chunks: List[dict]) -> str:
         """Generate an answer based on question and context chunks with observability."""
@@ -34,62 +69,109 @@ class LLMService:
         else:
             return await self._generate_answer_impl(question, context_chunks, None)
     
+    async def generate_answer_stream(self, question: str, context_chunks: List[dict]) -> AsyncIterator[str]:
+        """Yield the answer in pieces as the model produces them, with observability.
+        
+        Streamed answers bypass the prompt cache, since they are never held in full here.
+        """
+        if self.observability_service:
+            async with self.observability_service.trace_operation(
+                "llm_generation_stream",
+                model=self.model,
+                question=question,
+                context_count=len(context_chunks)
+            ):
+                async for delta in self._generate_answer_stream_impl(question, context_chunks):
+                    yield delta
+        else:
+            async for delta in self._generate_answer_stream_impl(question, context_chunks):
+                yield delta
+    
+    def _build_prompt(self, question: str, context_chunks: List[dict]) -> str:
+        """Build the user prompt from the question and the retrieved chunks.
+        
+        Pieces are collected in one list and joined once, so chunk texts are copied a single time.
+        """
+        parts = [PROMPT_HEADER]
+        for i, chunk in enumerate(context_chunks):
+            if i:
+                parts.append(CONTEXT_SEPARATOR)
+            parts.append(chunk.get("text", ""))
+            
+            metadata = chunk.get("metadata", {})
+            if metadata.get("page"):
+                parts.append(f" (Page {metadata['page']})")
+            elif metadata.get("filename"):
+                parts.append(f" (Source: {metadata['filename']})")
+        parts += (PROMPT_QUESTION, question, PROMPT_ANSWER)
+        
+        prompt = "".join(parts)
+        
+        if self._metrics_enabled:
+            self.observability_service.log_metrics("llm_generation", {
+                "context_length": len(prompt) - PROMPT_FIXED_LENGTH - len(question),
+                "context_chunks": len(context_chunks),
+                "question_length": len(question),
+                "model": self.model
+            })
+        
+        return prompt
+    
+    def _messages(self, prompt: str) -> List[dict]:
+        """Chat messages for a fully built prompt."""
+        return [SYSTEM_MESSAGE, {"role": "user", "content": prompt}]
+    
+    def _log_usage(self, usage):
+        """Log the token usage reported for a completion."""
+        if self.observability_service and usage:
+            self.observability_service.log_metrics("llm_usage", {
+                "prompt_tokens": getattr(usage, 'prompt_tokens', 0),
+                "completion_tokens": getattr(usage, 'completion_tokens', 0),
+                "total_tokens": getattr(usage, 'total_tokens', 0)
+            })
+    
     async def _generate_answer_impl(self, question: str, context_chunks: List[dict], trace_context=None) -> str:
         """Internal implementation of answer generation."""
         try:
-            context_texts = []
-            for chunk in context_chunks:
-                metadata = chunk.get("metadata", {})
-                text = chunk.get("text", "")
-                
-                source_info = ""
-                if metadata.get("page"):
-                    source_info = f" (Page {metadata['page']})"
-                elif metadata.get("filename"):
-                    source_info = f" (Source: {metadata['filename']})"
-                
-                context_texts.append(f"{text}{source_info}")
-            
-            context = "\n\n".join(context_texts)
+            return await self._complete(self._build_prompt(question, context_chunks))
             
-            prompt = f"""Based on the following context, please answer the question. If the answer cannot be found in the context, say "I don't have enough information to answer this question."
-
-                    Context:
-                    {context}
-
-                    Question: {question}
-
-                    Answer:"""
-            
-            if self.observability_service:
-                self.observability_service.log_metrics("llm_generation", {
-                    "context_length": len(context),
-                    "context_chunks": len(context_chunks),
-                    "question_length": len(question),
-                    "model": self.model
-                })
-            
-            response = self.client.chat.completions.create(
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate answer: {str(e)}")
+    
+    async def _generate_answer_stream_impl(self, question: str, context_chunks: List[dict]) -> AsyncIterator[str]:
+        """Internal implementation of streamed answer generation."""
+        try:
+            stream = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on provided context. Be concise and accurate."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._messages(self._build_prompt(question, context_chunks)),
                 max_tokens=500,
-                temperature=0.1
+                temperature=0.1,
+                stream=True,
+                stream_options={"include_usage": True}
             )
             
-            content = response.choices[0].message.content
-            answer = content.strip() if content else "I couldn't generate an answer."
-            
-            if self.observability_service and hasattr(response, 'usage') and response.usage:
-                self.observability_service.log_metrics("llm_usage", {
-                    "prompt_tokens": getattr(response.usage, 'prompt_tokens', 0),
-                    "completion_tokens": getattr(response.usage, 'completion_tokens', 0),
-                    "total_tokens": getattr(response.usage, 'total_tokens', 0)
-                })
-            
-            return answer
+            async for chunk in stream:
+                # The final chunk carries only the token usage and no choices
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage:
+                    self._log_usage(chunk.usage)
             
         except Exception as e:
-            raise RuntimeError(f"Failed to generate answer: {str(e)}") 
\ No newline at end of file
+            raise RuntimeError(f"Failed to generate answer: {str(e)}")
+    
+    async def _complete(self, prompt: str) -> str:
+        """Run the chat completion for a fully built prompt."""
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt),
+            max_tokens=500,
+            temperature=0.1
+        )
+        
+        content = response.choices[0].message.content
+        answer = content.strip() if content else "I couldn't generate an answer."
+        
+        self._log_usage(getattr(response, 'usage', None))
+        
+        return answer
\ No newline at end of file
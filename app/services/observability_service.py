@@ -1,19 +1,39 @@
+import asyncio
 import logging
 import time
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
 from functools import wraps
 from typing import Any, Dict, List, Optional
+import orjson
 from langfuse import Langfuse, observe
-from langfuse.openai import OpenAI
+from langfuse.openai import AsyncOpenAI
 from app.core.config import Settings
+from app.core.openai_client import create_async_openai
 
-# Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Maximum number of events written per wake-up of the background worker
+EVENT_BATCH_SIZE = 128
+
+# Upper bound on the formatted exception written for an error event
+ERROR_REPR_LIMIT = 512
+
+# Seconds the Langfuse warmup may take before startup carries on without it
+WARMUP_TIMEOUT = 5
+
+# Shared by every untraced operation; nullcontext holds no state, so one instance is reused
+NOOP_TRACE = nullcontext()
+
+
+@dataclass
+class ObservabilityEvent:
+    """Log event queued for the background worker."""
+    kind: str
+    name: str
+    payload: Dict[str, Any]
+    timestamp: float
+
 
 class ObservabilityService:
     """Service for managing Langfuse observability and structured logging."""
@@ -21,7 +41,13 @@ class ObservabilityService:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.langfuse_client = None
-        self.instrumented_openai = None
+        self.instrumented_async_openai = None
+        self.dropped_events = 0
+        # Metric, request and trace events are INFO logs; when they would be discarded they are not built
+        self._info_enabled = logger.isEnabledFor(logging.INFO)
+        self.metrics_enabled = settings.observability_metrics and self._info_enabled
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.observability_queue_size)
+        self._worker: Optional[asyncio.Task] = None
         
         if settings.langfuse_secret_key and settings.langfuse_public_key:
             try:
@@ -31,9 +57,7 @@ class ObservabilityService:
                     host=settings.langfuse_host
                 )
                 
-                self.instrumented_openai = OpenAI(
-                    api_key=settings.openai_api_key
-                )
+                self.instrumented_async_openai = create_async_openai(settings, AsyncOpenAI)
                 
                 logger.info("Langfuse observability initialized successfully")
             except Exception as e:
@@ -41,16 +65,115 @@ class ObservabilityService:
                 self.langfuse_client = None
         else:
             logger.info("Langfuse keys not provided, observability disabled")
+        
+        # With neither Langfuse nor INFO logs a trace records nothing, so skip it entirely
+        if not self.langfuse_client and not self._info_enabled:
+            self.trace_operation = self._trace_noop
+    
+    async def start(self):
+        """Start the background worker that drains queued log events."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._drain())
+    
+    async def stop(self):
+        """Wait for queued events to be written and stop the background worker."""
+        if self._worker is None:
+            return
+        
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        
+        if self.dropped_events:
+            logger.warning(f"Dropped {self.dropped_events} observability events (queue full)")
+    
+    async def warmup(self):
+        """Open the Langfuse connection at startup instead of on the first traced request."""
+        if not self.langfuse_client:
+            return
+        
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.langfuse_client.auth_check), WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Langfuse warmup timed out after {WARMUP_TIMEOUT}s")
+        except Exception as e:
+            logger.warning(f"Langfuse warmup failed: {e}")
+    
+    async def _drain(self):
+        """Write queued events in batches off the request path."""
+        while True:
+            events = [await self._queue.get()]
+            while len(events) < EVENT_BATCH_SIZE and not self._queue.empty():
+                events.append(self._queue.get_nowait())
+            
+            for event in events:
+                try:
+                    self._emit(event)
+                except Exception as e:
+                    logger.warning(f"Failed to write observability event: {e}")
+                finally:
+                    self._queue.task_done()
+    
+    def _enqueue(self, kind: str, name: str, payload: Dict[str, Any]):
+        """Queue an event for the worker, or write it inline when the worker is not running."""
+        event = ObservabilityEvent(kind, name, payload, time.monotonic())
+        
+        if self._worker is None:
+            self._emit(event)
+            return
+        
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped_events += 1
+    
+    def _emit(self, event: ObservabilityEvent):
+        """Write a single event to the structured log."""
+        if event.kind == "api_request":
+            logger.info(f"API Request: {event.name}", extra={
+                "endpoint": event.name,
+                "payload_size": len(orjson.dumps(event.payload)),
+                "event_type": event.kind
+            })
+        elif event.kind == "api_response":
+            logger.info(f"API Response: {event.name}", extra={
+                "endpoint": event.name,
+                **event.payload,
+                "event_type": event.kind
+            })
+        elif event.kind == "api_error":
+            error = event.payload["error"]
+            logger.error(f"API Error: {event.name}", extra={
+                "endpoint": event.name,
+                "error_type": type(error).__name__,
+                "error": repr(error)[:ERROR_REPR_LIMIT],
+                "event_type": event.kind
+            })
+        else:
+            logger.info(f"Metrics: {event.name}", extra={
+                "operation": event.name,
+                "metrics": event.payload,
+                "event_type": event.kind
+            })
+    
+    def _trace_noop(self, name: str, **kwargs):
+        """Stand-in for trace_operation when there is nowhere to record the trace."""
+        return NOOP_TRACE
     
     @asynccontextmanager
     async def trace_operation(self, name: str, **kwargs):
         """Context manager for tracing operations with Langfuse."""
         start_time = time.time()
         
-        logger.info(f"Starting operation: {name}", extra={
-            "operation": name,
-            "metadata": kwargs
-        })
+        if self._info_enabled:
+            logger.info(f"Starting operation: {name}", extra={
+                "operation": name,
+                "metadata": kwargs
+            })
         
         span = None
         
@@ -68,11 +191,12 @@ class ObservabilityService:
             }
             
             duration = time.time() - start_time
-            logger.info(f"Completed operation: {name}", extra={
-                "operation": name,
-                "duration_seconds": duration,
-                "status": "success"
-            })
+            if self._info_enabled:
+                logger.info(f"Completed operation: {name}", extra={
+                    "operation": name,
+                    "duration_seconds": duration,
+                    "status": "success"
+                })
             
             if span:
                 span.update(output={"status": "success", "duration": duration})
@@ -95,32 +219,30 @@ class ObservabilityService:
     
     def log_request(self, endpoint: str, payload: Dict[str, Any]):
         """Log incoming API requests."""
-        logger.info(f"API Request: {endpoint}", extra={
-            "endpoint": endpoint,
-            "payload_size": len(str(payload)),
-            "event_type": "api_request"
-        })
+        if self._info_enabled:
+            self._enqueue("api_request", endpoint, payload)
     
-    def log_response(self, endpoint: str, status_code: int, response_size: int):
+    def log_response(self, endpoint: str, status_code: int, response_size: Optional[int] = None):
         """Log API responses."""
-        logger.info(f"API Response: {endpoint}", extra={
-            "endpoint": endpoint,
-            "status_code": status_code,
-            "response_size": response_size,
-            "event_type": "api_response"
-        })
+        if not self._info_enabled:
+            return
+        payload = {"status_code": status_code}
+        if response_size is not None:
+            payload["response_size"] = response_size
+        self._enqueue("api_response", endpoint, payload)
+    
+    def log_error(self, endpoint: str, error: BaseException):
+        """Log an unhandled API error; the exception is formatted by the background worker."""
+        self._enqueue("api_error", endpoint, {"error": error})
     
     def log_metrics(self, operation: str, metrics: Dict[str, Any]):
         """Log operation metrics."""
-        logger.info(f"Metrics: {operation}", extra={
-            "operation": operation,
-            "metrics": metrics,
-            "event_type": "metrics"
-        })
-    
-    def get_instrumented_openai(self):
-        """Get Langfuse-instrumented OpenAI client."""
-        return self.instrumented_openai if self.instrumented_openai else None
+        if self.metrics_enabled:
+            self._enqueue("metrics", operation, metrics)
+    
+    def get_instrumented_async_openai(self):
+        """Get Langfuse-instrumented async OpenAI client."""
+        return self.instrumented_async_openai if self.instrumented_async_openai else None
     
     def create_generation(self, name: str, model: str, input_data: str, output_data: str, **kwargs):
         """Create a generation in Langfuse."""
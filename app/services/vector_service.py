@@ -1,7 +1,12 @@
-from typing import List, Dict, Any
+import asyncio
+import time
+from typing import List, Dict, Any, Sequence
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 from app.core.config import Settings
+from app.services.embedding_service import EmbeddingBatch
+from app.utils.search_batcher import SearchBatcher
 
 
 class VectorService:
@@ -10,6 +15,7 @@ class VectorService:
     def __init__(self, settings: Settings, observability_service=None):
         self.settings = settings
         self.observability_service = observability_service
+        self._metrics_enabled = bool(observability_service and observability_service.metrics_enabled)
         
         self.client = chromadb.PersistentClient(
             path=settings.chroma_persist_directory,
@@ -17,6 +23,13 @@ class VectorService:
         )
         self.collection_name = settings.collection_name
         self._initialize_collection()
+        
+        # Concurrent /query requests share one index query instead of one each
+        self.batcher = SearchBatcher(
+            self.search_similar_batch,
+            max_queries=settings.search_batch_max_queries,
+            max_wait=settings.search_batch_max_wait_ms / 1000
+        )
     
     def _initialize_collection(self):
         """Initialize the ChromaDB collection."""
@@ -30,44 +43,59 @@ class VectorService:
                 metadata={"hnsw:space": "cosine"}
             )
     
-    async def store_embeddings(self, embedding_results: List[dict]) -> int:
+    async def warmup(self):
+        """Touch the collection so its index is loaded before the first query."""
+        await asyncio.to_thread(self.collection.count)
+    
+    async def store_embeddings(self, embedding_batch: EmbeddingBatch) -> int:
         """Store embeddings in the vector database with observability."""
         if self.observability_service:
             async with self.observability_service.trace_operation(
                 "vector_storage",
-                embedding_count=len(embedding_results),
+                embedding_count=len(embedding_batch),
                 collection_name=self.collection_name
             ):
-                return await self._store_embeddings_impl(embedding_results)
+                return await self._store_embeddings_impl(embedding_batch)
         else:
-            return await self._store_embeddings_impl(embedding_results)
+            return await self._store_embeddings_impl(embedding_batch)
     
-    async def _store_embeddings_impl(self, embedding_results: List[dict]) -> int:
+    async def _store_embeddings_impl(self, embedding_batch: EmbeddingBatch) -> int:
         """Internal implementation of embedding storage."""
-        if not embedding_results:
+        if not len(embedding_batch):
             return 0
         
         try:
-            embeddings = [result["embedding"] for result in embedding_results]
-            documents = [result["text"] for result in embedding_results]
-            metadatas = [result["metadata"] for result in embedding_results]
-            ids = [result["chunk_id"] for result in embedding_results]
-            
-            self.collection.add(
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            # Chroma copies each add into Python lists before indexing, so writes are split into
+            # sub-batches to bound that copy; never above the client's own per-call limit.
+            # Chroma calls run in worker threads so HNSW inserts and searches never block the event loop.
+            step = min(self.settings.vector_store_batch_size or self.client.max_batch_size, self.client.max_batch_size)
+            for start in range(0, len(embedding_batch), step):
+                end = start + step
+                started = time.perf_counter()
+                await asyncio.to_thread(
+                    self.collection.add,
+                    embeddings=embedding_batch.embeddings[start:end],
+                    documents=embedding_batch.texts[start:end],
+                    metadatas=embedding_batch.metadatas[start:end],
+                    ids=embedding_batch.chunk_ids[start:end]
+                )
+                
+                if self._metrics_enabled:
+                    self.observability_service.log_metrics("vector_storage_batch", {
+                        "offset": start,
+                        "embeddings_stored": min(end, len(embedding_batch)) - start,
+                        "duration_seconds": time.perf_counter() - started
+                    })
             
-            if self.observability_service:
+            documents = embedding_batch.texts
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("vector_storage", {
-                    "embeddings_stored": len(embedding_results),
+                    "embeddings_stored": len(embedding_batch),
                     "collection_name": self.collection_name,
                     "average_document_length": sum(len(doc) for doc in documents) / len(documents) if documents else 0
                 })
             
-            return len(embedding_results)
+            return len(embedding_batch)
             
         except Exception as e:
             raise RuntimeError(f"Failed to store embeddings: {str(e)}")
@@ -86,61 +114,82 @@ class VectorService:
     async def _get_collection_stats_impl(self) -> Dict[str, Any]:
         """Internal implementation of collection stats retrieval."""
         try:
-            count = self.collection.count()
+            count = await asyncio.to_thread(self.collection.count)
             stats = {
                 "document_count": count,
                 "collection_name": self.collection_name
             }
             
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("collection_stats", stats)
             
             return stats
         except Exception as e:
             return {"error": str(e)}
     
-    async def search_similar(self, query_embedding: List[float], top_k: int = 5) -> List[dict]:
-        """Search for similar documents using embedding similarity with observability."""
+    async def search_similar(self, query_embedding: Sequence[float], top_k: int = 5) -> List[dict]:
+        """Search for similar documents, sharing one index query with concurrent searches."""
+        return await self.batcher.submit(query_embedding, top_k)
+    
+    async def search_similar_batch(self, query_embeddings: Sequence[Sequence[float]], top_k: int = 5) -> List[List[dict]]:
+        """Search for documents similar to each query embedding in one index call with observability."""
         if self.observability_service:
             async with self.observability_service.trace_operation(
                 "similarity_search",
                 top_k=top_k,
+                query_count=len(query_embeddings),
                 collection_name=self.collection_name,
-                embedding_dimension=len(query_embedding) if query_embedding else 0
+                embedding_dimension=len(query_embeddings[0]) if len(query_embeddings) else 0
             ):
-                return await self._search_similar_impl(query_embedding, top_k)
+                return await self._search_similar_batch_impl(query_embeddings, top_k)
         else:
-            return await self._search_similar_impl(query_embedding, top_k)
+            return await self._search_similar_batch_impl(query_embeddings, top_k)
     
-    async def _search_similar_impl(self, query_embedding: List[float], top_k: int) -> List[dict]:
+    async def _search_similar_batch_impl(self, query_embeddings: Sequence[Sequence[float]], top_k: int) -> List[List[dict]]:
         """Internal implementation of similarity search."""
+        if not len(query_embeddings):
+            return []
+        
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
+            # Packed into one contiguous float32 matrix, matching how chunks are stored
+            results = await asyncio.to_thread(
+                self.collection.query,
+                query_embeddings=np.asarray(query_embeddings, dtype=np.float32),
                 n_results=top_k,
                 include=["documents", "metadatas", "distances"]
             )
             
-            search_results = []
-            if results and results["documents"] and results["documents"][0]:
-                for i, doc in enumerate(results["documents"][0]):
-                    result = {
-                        "text": doc,
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] and results["metadatas"][0] else {},
-                        "distance": results["distances"][0][i] if results["distances"] and results["distances"][0] else 0.0
-                    }
-                    search_results.append(result)
+            # Chroma returns one inner list per query; missing columns become placeholders
+            documents = results.get("documents") or [[]] * len(query_embeddings)
+            metadatas = results.get("metadatas") or [None] * len(query_embeddings)
+            distances = results.get("distances") or [None] * len(query_embeddings)
+            
+            batch_results = []
+            returned = 0
+            total_distance = 0.0
+            for docs, metas, dists in zip(documents, metadatas, distances):
+                docs = docs or []
+                metas = metas or [{}] * len(docs)
+                dists = dists or [0.0] * len(docs)
+                batch_results.append([
+                    {"text": doc, "metadata": metadata, "distance": distance}
+                    for doc, metadata, distance in zip(docs, metas, dists)
+                ])
+                if self._metrics_enabled:
+                    returned += len(docs)
+                    total_distance += sum(dists)
             
-            if self.observability_service:
+            if self._metrics_enabled:
                 self.observability_service.log_metrics("similarity_search", {
-                    "query_embedding_dimension": len(query_embedding) if query_embedding else 0,
+                    "query_embedding_dimension": len(query_embeddings[0]),
+                    "query_count": len(query_embeddings),
                     "top_k_requested": top_k,
-                    "results_returned": len(search_results),
+                    "results_returned": returned,
                     "collection_name": self.collection_name,
-                    "average_distance": sum(r["distance"] for r in search_results) / len(search_results) if search_results else 0
+                    "average_distance": total_distance / returned if returned else 0
                 })
             
-            return search_results
+            return batch_results
         
         except Exception as e:
-            raise RuntimeError(f"Failed to search similar documents: {str(e)}") 
\ No newline at end of file
+            raise RuntimeError(f"Failed to search similar documents: {str(e)}")
\ No newline at end of file
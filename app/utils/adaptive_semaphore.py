@@ -0,0 +1,31 @@
+import asyncio
+
+
+class AdaptiveSemaphore:
+    """Concurrency limit that halves when throttled and grows back by one per success (AIMD)."""
+    
+    def __init__(self, max_permits: int):
+        self.max_permits = max_permits
+        self.limit = max_permits
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_use < self.limit)
+            self._in_use += 1
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_use -= 1
+            # Wake every waiter: the limit may have grown since they started waiting
+            self._condition.notify_all()
+    
+    def throttle(self):
+        """Halve the limit after the upstream API pushed back."""
+        self.limit = max(1, self.limit // 2)
+    
+    def recover(self):
+        """Grow the limit by one after a successful call."""
+        if self.limit < self.max_permits:
+            self.limit += 1
@@ -1,9 +1,65 @@
-import requests
 import io
-from typing import Dict, Any, Union, Optional
-from bs4 import BeautifulSoup
+import re
+import shutil
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, BinaryIO, List, Tuple, Union, Optional
 from langchain_core.documents import Document
-import pdfplumber
+from lxml import etree
+import pymupdf
+
+if TYPE_CHECKING:
+    import requests
+
+# Decodes as UTF-8 regardless of any declared charset, since load_html is always given decoded text
+HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+# Nodes whose content is never page text; their tail (text after the closing tag) still is
+NON_TEXT_NODES = (etree.Comment, etree.ProcessingInstruction, "script", "style")
+
+# Runs of whitespace in extracted page text, collapsed to single spaces
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Connect and read timeouts for URL loading, in seconds
+URL_TIMEOUT = (5, 30)
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16  # 64 KiB per read
+
+# Largest HTML or text response read from a URL; bigger bodies are rejected before they fill memory
+MAX_PAGE_BYTES = 32 << 20  # 32 MiB
+
+
+@lru_cache(maxsize=1)
+def _url_session() -> "requests.Session":
+    """Session shared by all URL loads, so repeated fetches reuse pooled keep-alive connections.
+    
+    requests is imported on the first URL load rather than with this module, which the
+    parsing processes also import and which otherwise never touches the network.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PagedDocument(Document):
+    """A document that keeps the text of each page, so it can be chunked page by page."""
+    
+    # One entry per page, empty for pages without text, so positions match page numbers
+    pages: List[str] = []
+
+
+# PyMuPDF extracts text in C; pdfplumber's pure-Python layout analysis is kept as a fallback
+# and only imported (along with pdfminer) when it is selected
+PDF_ENGINES = ("pymupdf", "pdfplumber")
 
 
 class DocumentLoader:
@@ -17,16 +73,15 @@ class DocumentLoader:
     
     @staticmethod
     def load_html(content: str, metadata: Optional[Dict[str, Any]] = None) -> Document:
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        text = soup.get_text()
+        # Parsed and walked entirely in lxml's C code, without building BeautifulSoup wrappers
+        root = etree.fromstring(content.encode("utf-8"), HTML_PARSER) if content else None
+        if root is None:
+            text = ""
+        else:
+            etree.strip_elements(root, *NON_TEXT_NODES, with_tail=False)
+            text = "".join(root.itertext())
         
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+        text = WHITESPACE_RE.sub(" ", text).strip()
         
         if metadata is None:
             metadata = {"type": "html"}
@@ -40,93 +95,157 @@ class DocumentLoader:
         return Document(page_content=content, metadata=metadata)
     
     @staticmethod
-    def load_pdf(content: Union[str, bytes], metadata: Optional[Dict[str, Any]] = None) -> Document:
-        if metadata is None:
-            metadata = {"type": "pdf"}
+    def _pdf_source(content: Union[str, bytes, BinaryIO]) -> Tuple[Union[str, BinaryIO], str]:
+        """Return what pdfplumber should open for ``content``, and the source type recorded in metadata."""
+        if isinstance(content, str):
+            return content, "pdf_file"
+        if isinstance(content, bytes):
+            return io.BytesIO(content), "pdf_bytes"
+        if hasattr(content, "read"):
+            # File-like objects (e.g. spooled uploads) are parsed in place without copying
+            return content, "pdf_stream"
+        raise ValueError("PDF content must be a file path (str), binary data (bytes) or a binary file object")
+    
+    @staticmethod
+    def extract_pdf_pages(
+        content: Union[str, bytes, BinaryIO],
+        start: int = 0,
+        stop: Optional[int] = None,
+        engine: str = "pymupdf",
+        max_pages: Optional[int] = None
+    ) -> Tuple[int, List[str]]:
+        """Return the PDF's page count and the text of pages ``start`` to ``stop`` (0-based, exclusive).
         
+        Pages without text come back as empty strings, so positions stay aligned with page numbers.
+        When the PDF has more than ``max_pages`` pages no text is extracted, only the count.
+        """
         try:
-            if isinstance(content, str):
-                with pdfplumber.open(content) as pdf:
-                    text_parts = []
-                    total_pages = len(pdf.pages)
-                    
-                    for page_num, page in enumerate(pdf.pages, 1):
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(f"\n--- Page {page_num} ---\n{page_text}")
-                    
-                    full_text = "\n".join(text_parts)
-                    
-                    metadata.update({
-                        "total_pages": total_pages,
-                        "source_type": "pdf_file"
-                    })
+            if engine not in PDF_ENGINES:
+                raise ValueError(f"Unsupported PDF engine: {engine}")
             
-            elif isinstance(content, bytes):
-                with pdfplumber.open(io.BytesIO(content)) as pdf:
-                    text_parts = []
-                    total_pages = len(pdf.pages)
-                    
-                    for page_num, page in enumerate(pdf.pages, 1):
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(f"\n--- Page {page_num} ---\n{page_text}")
-                    
-                    full_text = "\n".join(text_parts)
-                    
-                    metadata.update({
-                        "total_pages": total_pages,
-                        "source_type": "pdf_bytes"
-                    })
+            source, _ = DocumentLoader._pdf_source(content)
+            if engine == "pdfplumber":
+                import pdfplumber
+                with pdfplumber.open(source) as pdf:
+                    # Bound once; pdf.pages is a property
+                    pages = pdf.pages
+                    if max_pages is not None and len(pages) > max_pages:
+                        return len(pages), []
+                    return len(pages), [page.extract_text() or "" for page in pages[start:stop]]
             
+            if isinstance(content, str):
+                pdf = pymupdf.open(content)
             else:
-                raise ValueError("PDF content must be either a file path (str) or binary data (bytes)")
-            
-            if not full_text.strip():
-                raise ValueError("No text could be extracted from the PDF")
-            
-            return Document(page_content=full_text, metadata=metadata)
-        
+                # MuPDF reads from an in-memory buffer; bytes and BytesIO contents are handed over without a copy
+                if isinstance(content, bytes):
+                    stream = content
+                elif isinstance(content, io.BytesIO):
+                    stream = content.getbuffer()
+                else:
+                    stream = source.read()
+                pdf = pymupdf.open(stream=stream, filetype="pdf")
+            with pdf:
+                if max_pages is not None and pdf.page_count > max_pages:
+                    return pdf.page_count, []
+                pages = range(*slice(start, stop).indices(pdf.page_count))
+                return pdf.page_count, [pdf[i].get_text() for i in pages]
         except Exception as e:
             raise ValueError(f"Failed to process PDF: {str(e)}")
     
+    @staticmethod
+    def pdf_document_from_pages(page_texts: List[str], metadata: Dict[str, Any]) -> PagedDocument:
+        """Assemble extracted page texts into one document that keeps its pages."""
+        full_text = "\n\n".join(page_text for page_text in page_texts if page_text)
+        
+        if not full_text.strip():
+            raise ValueError("Failed to process PDF: No text could be extracted from the PDF")
+        
+        return PagedDocument(page_content=full_text, metadata=metadata, pages=page_texts)
+    
+    @staticmethod
+    def load_pdf(
+        content: Union[str, bytes, BinaryIO],
+        metadata: Optional[Dict[str, Any]] = None,
+        engine: str = "pymupdf"
+    ) -> PagedDocument:
+        if metadata is None:
+            metadata = {"type": "pdf"}
+        
+        total_pages, page_texts = DocumentLoader.extract_pdf_pages(content, engine=engine)
+        _, source_type = DocumentLoader._pdf_source(content)
+        
+        metadata.update({
+            "total_pages": total_pages,
+            "source_type": source_type
+        })
+        return DocumentLoader.pdf_document_from_pages(page_texts, metadata)
+    
     @staticmethod
     def load_pdf_from_url(url: str) -> Document:
+        import requests
+        import urllib3
+        
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            metadata = {
-                "source": url,
-                "type": "pdf"
-            }
-            
-            return DocumentLoader.load_pdf(response.content, metadata)
+            with _url_session().get(url, timeout=URL_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                
+                # Read in fixed-size blocks straight into one buffer, rather than
+                # response.content's list of chunks joined into a second copy
+                response.raw.decode_content = True
+                buffer = io.BytesIO()
+                shutil.copyfileobj(response.raw, buffer, DOWNLOAD_CHUNK_SIZE)
             
-        except requests.RequestException as e:
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
             raise ValueError(f"Failed to download PDF from URL {url}: {str(e)}")
+        
+        metadata = {
+            "source": url,
+            "type": "pdf"
+        }
+        
+        buffer.seek(0)
+        return DocumentLoader.load_pdf(buffer, metadata)
     
     @staticmethod
     def load_from_url(url: str, document_type: str = "html") -> Document:
+        if document_type == "pdf":
+            return DocumentLoader.load_pdf_from_url(url)
+        
+        import requests
+        
         try:
-            if document_type == "pdf":
-                return DocumentLoader.load_pdf_from_url(url)
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            metadata = {
-                "source": url,
-                "type": document_type
-            }
-            
-            if document_type == "html":
-                return DocumentLoader.load_html(response.text, metadata)
-            else:
-                return DocumentLoader.load_text(response.text, metadata)
+            with _url_session().get(url, timeout=URL_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                
+                too_large = f"Failed to load document from URL {url}: response is larger than {MAX_PAGE_BYTES} bytes"
+                if int(response.headers.get("Content-Length") or 0) > MAX_PAGE_BYTES:
+                    raise ValueError(too_large)
+                
+                # Read in blocks so an oversized body is abandoned as soon as it passes the limit
+                body = bytearray()
+                for block in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    body += block
+                    if len(body) > MAX_PAGE_BYTES:
+                        raise ValueError(too_large)
+                
+                try:
+                    text = str(body, response.encoding or "utf-8", errors="replace")
+                except LookupError:
+                    # Unknown charset declared by the server
+                    text = str(body, "utf-8", errors="replace")
                 
         except requests.RequestException as e:
             raise ValueError(f"Failed to load document from URL {url}: {str(e)}")
+        
+        metadata = {
+            "source": url,
+            "type": document_type
+        }
+        
+        if document_type == "html":
+            return DocumentLoader.load_html(text, metadata)
+        else:
+            return DocumentLoader.load_text(text, metadata)
     
     @classmethod
     def load_document(cls, content: str, document_type: str) -> Document:
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+# Embeds a list of texts into an (n, dimensions) array
+EmbedFunction = Callable[[List[str]], Awaitable[np.ndarray]]
+
+
+class EmbeddingBatcher:
+    """Coalesces embedding requests from concurrent callers into shared API calls.
+    
+    Texts are buffered until ``max_rows`` texts or ``max_tokens`` tokens are pending,
+    or ``max_wait`` seconds have passed since the buffer started filling, then sent
+    in one request and the results are handed back to each caller in order.
+    """
+    
+    def __init__(
+        self,
+        embed: EmbedFunction,
+        max_rows: int = 2048,
+        max_wait: float = 0.05,
+        max_tokens: int = 250_000
+    ):
+        self._embed = embed
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.max_tokens = max_tokens
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+    
+    def _is_full(self) -> bool:
+        return len(self._pending) >= self.max_rows or self._pending_tokens >= self.max_tokens
+    
+    async def submit_many(self, texts: List[str], token_counts: Sequence[int]) -> List[np.ndarray]:
+        """Embed ``texts``, whose sizes are given by ``token_counts``, as part of the next shared batch."""
+        if not texts:
+            return []
+        
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        self._pending.extend(zip(texts, token_counts, futures))
+        self._pending_tokens += sum(token_counts)
+        
+        if self._is_full():
+            self._wakeup.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        
+        return list(await asyncio.gather(*futures))
+    
+    async def _flush_loop(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            batch = self._take_batch()
+            if self._is_full():
+                self._wakeup.set()
+            
+            # Batches are dispatched without waiting so a full buffer never stalls the next one
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    def _take_batch(self) -> List[Tuple[str, int, asyncio.Future]]:
+        """Pop the longest prefix of pending texts that fits both limits (always at least one)."""
+        rows = tokens = 0
+        for _, count, _ in self._pending:
+            if rows and (rows == self.max_rows or tokens + count > self.max_tokens):
+                break
+            rows += 1
+            tokens += count
+        
+        batch = self._pending[:rows]
+        del self._pending[:rows]
+        self._pending_tokens -= tokens
+        return batch
+    
+    async def _dispatch(self, batch: List[Tuple[str, int, asyncio.Future]]):
+        try:
+            embeddings = await self._embed([text for text, _, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                # Futures of cancelled callers are already done; setting an exception on them
+                # would fail, and nothing would ever retrieve it
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, _, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
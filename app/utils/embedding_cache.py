@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import diskcache
+import numpy as np
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: a bounded in-process LRU in front of an optional on-disk store.
+    
+    Embeddings are kept in memory as float32 arrays and on disk as float16,
+    which halves the store at a precision cost far below what cosine ranking notices.
+    """
+    
+    def __init__(self, model: str, max_entries: int, directory: Optional[str] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._disk = diskcache.Cache(directory) if directory else None
+        # Lookups answered from either tier, and lookups that had to go to the API
+        self.hits = 0
+        self.misses = 0
+    
+    def _key(self, text: str) -> str:
+        # The model is part of the key so switching models never serves stale vectors
+        return hashlib.sha256(f"{self.model}\x1f{text}".encode()).hexdigest()
+    
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    async def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached embedding for each text, or None where there is none."""
+        keys = [self._key(text) for text in texts]
+        found: List[Optional[np.ndarray]] = []
+        for key in keys:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+            found.append(embedding)
+        
+        missing = [i for i, embedding in enumerate(found) if embedding is None]
+        if self._disk is not None and missing:
+            disk = self._disk
+            stored = await asyncio.to_thread(lambda: [disk.get(keys[i]) for i in missing])
+            for i, embedding in zip(missing, stored):
+                if embedding is not None:
+                    # Stored as float16 (or plain lists by older versions)
+                    embedding = np.asarray(embedding, dtype=np.float32)
+                    found[i] = embedding
+                    self._remember(keys[i], embedding)
+        
+        misses = sum(1 for embedding in found if embedding is None)
+        self.misses += misses
+        self.hits += len(found) - misses
+        return found
+    
+    async def set_many(self, texts: List[str], embeddings: Sequence[np.ndarray]):
+        """Store freshly generated embeddings in both tiers."""
+        keys = [self._key(text) for text in texts]
+        # Own copies, so a cached row never keeps its whole batch matrix alive
+        embeddings = [np.array(embedding, dtype=np.float32) for embedding in embeddings]
+        for key, embedding in zip(keys, embeddings):
+            self._remember(key, embedding)
+        
+        if self._disk is not None and keys:
+            disk = self._disk
+            
+            def write():
+                with disk.transact():
+                    for key, embedding in zip(keys, embeddings):
+                        disk.set(key, embedding.astype(np.float16))
+            
+            await asyncio.to_thread(write)
@@ -0,0 +1,37 @@
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+import diskcache
+
+
+class PdfTextCache:
+    """On-disk cache of extracted PDF page texts, keyed by a hash of the file's bytes.
+    
+    Re-uploading a PDF that was already ingested skips extraction entirely; the
+    store is size-bounded and evicts the least recently used documents first.
+    """
+    
+    def __init__(self, directory: str, size_limit: int):
+        self._disk = diskcache.Cache(
+            directory,
+            size_limit=size_limit,
+            eviction_policy="least-recently-used"
+        )
+    
+    @staticmethod
+    def _key(file_path: str, engine: str) -> str:
+        # The engine is part of the key since each extracts slightly different text
+        with open(file_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha1").hexdigest()
+        return f"{engine}:{digest}"
+    
+    async def key(self, file_path: str, engine: str) -> str:
+        """Hash the PDF on disk, off the event loop."""
+        return await asyncio.to_thread(self._key, file_path, engine)
+    
+    async def get(self, key: str) -> Optional[Tuple[int, List[str]]]:
+        """Return the cached page count and page texts, or None."""
+        return await asyncio.to_thread(self._disk.get, key)
+    
+    async def set(self, key: str, total_pages: int, page_texts: List[str]):
+        await asyncio.to_thread(self._disk.set, key, (total_pages, page_texts))
@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.utils.document_loader import DocumentLoader
+from app.utils.text_splitter import ChunkList, SmartTextSplitter
+
+
+@lru_cache()
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> SmartTextSplitter:
+    return SmartTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def parse_and_split_pdf(
+    file_path: str,
+    metadata: Dict[str, Any],
+    chunk_size: int,
+    chunk_overlap: int,
+    engine: str = "pymupdf"
+) -> Tuple[Document, ChunkList]:
+    """Parse a PDF on disk and chunk it.
+
+    Runs inside the parsing process pool, so it lives in a module that imports
+    nothing beyond the loader and splitter.
+    """
+    document = DocumentLoader.load_pdf(file_path, metadata, engine)
+    return document, _get_splitter(chunk_size, chunk_overlap).split_document(document)
+
+
+def extract_short_pdf(file_path: str, max_pages: int, engine: str = "pymupdf") -> Tuple[int, Optional[List[str]]]:
+    """Page count of a PDF on disk, and the text of every page if it has at most ``max_pages``.
+    
+    Short PDFs are extracted in the same open that counts their pages; longer
+    ones come back without text (None), to be extracted in parallel ranges.
+    """
+    total_pages, page_texts = DocumentLoader.extract_pdf_pages(file_path, engine=engine, max_pages=max_pages)
+    return total_pages, page_texts if total_pages <= max_pages else None
+
+
+def extract_pdf(file_path: str, engine: str = "pymupdf") -> Tuple[int, List[str]]:
+    """Page count and text of every page of a PDF on disk."""
+    return DocumentLoader.extract_pdf_pages(file_path, engine=engine)
+
+
+def extract_pdf_page_range(file_path: str, start: int, stop: int, engine: str = "pymupdf") -> List[str]:
+    """Text of pages ``start`` to ``stop`` of a PDF on disk, one share of a parallel extraction."""
+    return DocumentLoader.extract_pdf_pages(file_path, start, stop, engine)[1]
+
+
+def split_pdf_pages(
+    page_texts: List[str],
+    metadata: Dict[str, Any],
+    chunk_size: int,
+    chunk_overlap: int
+) -> Tuple[Document, ChunkList]:
+    """Assemble pages extracted in parallel into one document and chunk it."""
+    document = DocumentLoader.pdf_document_from_pages(page_texts, metadata)
+    return document, _get_splitter(chunk_size, chunk_overlap).split_document(document)
@@ -0,0 +1,22 @@
+from dataclasses import dataclass, field
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case and collapse whitespace, so case and spacing variants share a cache entry."""
+    return " ".join(question.lower().split())
+
+
+@dataclass(frozen=True)
+class QueryCacheKey:
+    """Query cache key: compares and hashes by the normalized question and cache generation only.
+    
+    The question as asked rides along, so case and spacing variants share an entry
+    while the pipeline still embeds and prompts with the user's own text.
+    """
+    normalized_question: str
+    generation: int
+    question: str = field(compare=False)
+    
+    @classmethod
+    def for_question(cls, question: str, generation: int) -> "QueryCacheKey":
+        return cls(normalize_question(question), generation, question)
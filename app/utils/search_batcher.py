@@ -0,0 +1,71 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Runs one similarity search per query embedding, returning each query's results in order
+SearchFunction = Callable[[List[Sequence[float]], int], Awaitable[List[List[dict]]]]
+
+
+class SearchBatcher:
+    """Coalesces similarity searches from concurrent callers into shared index queries.
+    
+    Queries are buffered until ``max_queries`` are pending or ``max_wait`` seconds
+    have passed since the buffer started filling, then run together (one call per
+    distinct ``top_k``) and the results are handed back to each caller.
+    """
+    
+    def __init__(self, search: SearchFunction, max_queries: int = 32, max_wait: float = 0.01):
+        self._search = search
+        self.max_queries = max_queries
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Sequence[float], int, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+    
+    async def submit(self, query_embedding: Sequence[float], top_k: int) -> List[dict]:
+        """Search for ``query_embedding`` as part of the next shared batch."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query_embedding, top_k, future))
+        
+        if len(self._pending) >= self.max_queries:
+            self._wakeup.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        
+        return await future
+    
+    async def _flush_loop(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            batch = self._pending[:self.max_queries]
+            del self._pending[:self.max_queries]
+            if len(self._pending) >= self.max_queries:
+                self._wakeup.set()
+            
+            # Queries asking for different result counts cannot share an index call
+            by_top_k: Dict[int, List[Tuple[Sequence[float], asyncio.Future]]] = {}
+            for embedding, top_k, future in batch:
+                by_top_k.setdefault(top_k, []).append((embedding, future))
+            
+            for top_k, queries in by_top_k.items():
+                task = asyncio.create_task(self._dispatch(queries, top_k))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, queries: List[Tuple[Sequence[float], asyncio.Future]], top_k: int):
+        try:
+            results = await self._search([embedding for embedding, _ in queries], top_k)
+        except Exception as e:
+            for _, future in queries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(queries, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,61 @@
+import time
+from typing import Any, List, Optional, Sequence
+import numpy as np
+
+
+class SemanticCache:
+    """Fixed-size cache of values keyed by embedding similarity.
+    
+    Keys are unit-normalized float32 rows of one matrix, so a lookup is a single
+    matrix-vector product. When full, the oldest entry is overwritten.
+    With ``max_entries`` of zero or less nothing is stored and every lookup misses.
+    """
+    
+    def __init__(self, max_entries: int, threshold: float, ttl: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._keys: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        self._expires = np.zeros(max(max_entries, 0))
+        self._next = 0
+    
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, embedding: Sequence[float]) -> Optional[Any]:
+        """Return the value of the most similar live entry at or above the threshold."""
+        if not self._values:
+            return None
+        
+        similarities = self._keys[:len(self._values)] @ self._normalize(embedding)
+        similarities[self._expires[:len(self._values)] < time.monotonic()] = -1
+        best = int(similarities.argmax())
+        return self._values[best] if similarities[best] >= self.threshold else None
+    
+    def set(self, embedding: Sequence[float], value: Any):
+        """Store ``value`` under ``embedding``, replacing the oldest entry when full."""
+        if self.max_entries <= 0:
+            return
+        
+        key = self._normalize(embedding)
+        if self._keys is None or self._keys.shape[1] != key.shape[0]:
+            self._keys = np.zeros((self.max_entries, key.shape[0]), dtype=np.float32)
+            self.clear()
+        
+        slot = self._next
+        self._keys[slot] = key
+        self._expires[slot] = time.monotonic() + self.ttl
+        if slot < len(self._values):
+            self._values[slot] = value
+        else:
+            self._values.append(value)
+        self._next = (slot + 1) % self.max_entries
+    
+    def clear(self):
+        """Drop every entry."""
+        self._values = []
+        self._next = 0
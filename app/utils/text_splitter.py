@@ -1,8 +1,8 @@
 from typing import List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from app.utils.document_loader import PagedDocument
 import uuid
-import re
 
 
 class DocumentChunk:
@@ -14,6 +14,14 @@ class DocumentChunk:
         self.chunk_id = chunk_id or str(uuid.uuid4())
 
 
+class ChunkList(list):
+    """Chunks of one document, with their total text length counted while they were built."""
+    
+    def __init__(self, chunks: List[DocumentChunk] = (), total_chars: int = 0):
+        super().__init__(chunks)
+        self.total_chars = total_chars
+
+
 class SmartTextSplitter:
     
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
@@ -23,42 +31,51 @@ class SmartTextSplitter:
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
-            separators=["\n--- Page", "\n\n", "\n", " ", ""]
+            separators=["\n\n", "\n", " ", ""]
         )
     
-    def _extract_page_number(self, text: str) -> Optional[int]:
-        page_match = re.search(r"--- Page (\d+) ---", text)
-        if page_match:
-            return int(page_match.group(1))
-        return None
+    def _split_text(self, text: str) -> List[str]:
+        if len(text) <= self.chunk_size:
+            # Fits in one chunk; the recursive splitter would only strip it
+            stripped = text.strip()
+            return [stripped] if stripped else []
+        # split_text skips the per-chunk Document objects and metadata deep copies of split_documents
+        return self.text_splitter.split_text(text)
     
-    def split_document(self, document: Document) -> List[DocumentChunk]:
-        """Split a document into chunks with metadata preservation."""
-        chunks = self.text_splitter.split_documents([document])
+    def split_document(self, document: Document) -> ChunkList:
+        """Split a document into chunks with metadata preservation.
+        
+        Paged documents (PDFs) are split one page at a time, and each chunk records its page.
+        """
+        if isinstance(document, PagedDocument):
+            texts: List[str] = []
+            pages: Optional[List[int]] = []
+            for page_num, page_text in enumerate(document.pages, 1):
+                page_chunks = self._split_text(page_text)
+                texts.extend(page_chunks)
+                pages.extend([page_num] * len(page_chunks))
+        else:
+            texts = self._split_text(document.page_content)
+            pages = None
+        
+        total_chunks = len(texts)
+        original_length = len(document.page_content)
         
         document_chunks = []
-        for i, chunk in enumerate(chunks):
+        total_chars = 0
+        for i, text in enumerate(texts):
             metadata = {
-                **chunk.metadata,
+                **document.metadata,
                 "chunk_index": i,
-                "total_chunks": len(chunks),
-                "chunk_size": len(chunk.page_content),
-                "original_length": len(document.page_content)
+                "total_chunks": total_chunks,
+                "chunk_size": len(text),
+                "original_length": original_length
             }
             
-            if chunk.metadata.get("type") == "pdf":
-                page_num = self._extract_page_number(chunk.page_content)
-                if page_num:
-                    metadata["page"] = page_num
-                    
-
-                clean_text = re.sub(r"\n--- Page \d+ ---\n", "\n", chunk.page_content)
-                chunk.page_content = clean_text.strip()
+            if pages is not None:
+                metadata["page"] = pages[i]
             
-            document_chunk = DocumentChunk(
-                text=chunk.page_content,
-                metadata=metadata
-            )
-            document_chunks.append(document_chunk)
+            document_chunks.append(DocumentChunk(text=text, metadata=metadata))
+            total_chars += len(text)
         
-        return document_chunks 
\ No newline at end of file
+        return ChunkList(document_chunks, total_chars)
\ No newline at end of file
@@ -0,0 +1,83 @@
+import asyncio
+import gc
+import unittest
+from typing import List
+import numpy as np
+from app.utils.embedding_batcher import EmbeddingBatcher
+
+
+class EmbeddingBatcherTest(unittest.IsolatedAsyncioTestCase):
+    
+    async def asyncSetUp(self):
+        self.unhandled: List[dict] = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: self.unhandled.append(context))
+    
+    @staticmethod
+    def _recording_embed(calls: List[List[str]]):
+        async def embed(texts: List[str]) -> np.ndarray:
+            calls.append(texts)
+            # Each row holds its text's number, so results can be matched back to inputs
+            return np.array([[float(text)] for text in texts], dtype=np.float32)
+        return embed
+    
+    async def test_concurrent_callers_share_one_request(self):
+        calls: List[List[str]] = []
+        batcher = EmbeddingBatcher(self._recording_embed(calls), max_rows=10, max_wait=0.01)
+        
+        first, second = await asyncio.gather(
+            batcher.submit_many(["1", "2"], [1, 1]),
+            batcher.submit_many(["3"], [1])
+        )
+        
+        self.assertEqual(calls, [["1", "2", "3"]])
+        self.assertEqual([row[0] for row in first], [1.0, 2.0])
+        self.assertEqual([row[0] for row in second], [3.0])
+    
+    async def test_batches_respect_max_rows(self):
+        calls: List[List[str]] = []
+        batcher = EmbeddingBatcher(self._recording_embed(calls), max_rows=2, max_wait=0.01)
+        
+        result = await batcher.submit_many(["1", "2", "3", "4", "5"], [1] * 5)
+        
+        self.assertEqual(calls, [["1", "2"], ["3", "4"], ["5"]])
+        self.assertEqual([row[0] for row in result], [1.0, 2.0, 3.0, 4.0, 5.0])
+    
+    async def test_batches_respect_max_tokens(self):
+        calls: List[List[str]] = []
+        batcher = EmbeddingBatcher(self._recording_embed(calls), max_rows=10, max_wait=0.01, max_tokens=10)
+        
+        # A text over the token budget still goes out, alone
+        await batcher.submit_many(["1", "2", "3", "4"], [6, 4, 12, 3])
+        
+        self.assertEqual(calls, [["1", "2"], ["3"], ["4"]])
+    
+    async def test_failed_batch_reaches_every_waiter(self):
+        calls: List[List[str]] = []
+        
+        async def embed(texts: List[str]) -> np.ndarray:
+            calls.append(texts)
+            await asyncio.sleep(0)
+            raise RuntimeError("api down")
+        
+        batcher = EmbeddingBatcher(embed, max_rows=10, max_wait=0.01)
+        first = asyncio.create_task(batcher.submit_many(["a", "b"], [1, 1]))
+        second = asyncio.create_task(batcher.submit_many(["c"], [1]))
+        cancelled = asyncio.create_task(batcher.submit_many(["d"], [1]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        
+        results = await asyncio.gather(first, second, cancelled, return_exceptions=True)
+        
+        self.assertEqual(calls, [["a", "b", "c", "d"]])
+        self.assertIsInstance(results[0], RuntimeError)
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertIsInstance(results[2], asyncio.CancelledError)
+        
+        # Futures of the cancelled caller must be skipped, not left holding an unretrieved exception
+        gc.collect()
+        await asyncio.sleep(0)
+        self.assertEqual(self.unhandled, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import logging
+import queue
+import unittest
+from typing import Callable
+import orjson
+from app.core.logging_config import JSONFormatter, StructuredQueueHandler
+
+
+class JSONLoggingTest(unittest.TestCase):
+    
+    def _log_through_queue(self, log: Callable[[logging.Logger], None]) -> dict:
+        """Log via the queue handler the app installs and format what the listener would receive."""
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        logger = logging.getLogger("tests.logging_config")
+        logger.propagate = False
+        handler = StructuredQueueHandler(log_queue)
+        logger.addHandler(handler)
+        try:
+            log(logger)
+        finally:
+            logger.removeHandler(handler)
+        return orjson.loads(JSONFormatter().format(log_queue.get_nowait()))
+    
+    def test_exception_is_a_separate_field(self):
+        def log(logger):
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("Failed operation: %s", "ingest", extra={"operation": "ingest"})
+        
+        entry = self._log_through_queue(log)
+        
+        self.assertIn("exception", entry)
+        self.assertIn("ValueError: boom", entry["exception"])
+        self.assertEqual(entry["message"], "Failed operation: ingest")
+        self.assertEqual(entry["operation"], "ingest")
+    
+    def test_record_without_exception_has_no_exception_field(self):
+        entry = self._log_through_queue(lambda logger: logger.warning("plain"))
+        
+        self.assertNotIn("exception", entry)
+        self.assertEqual(entry["message"], "plain")
+
+
+if __name__ == "__main__":
+    unittest.main()
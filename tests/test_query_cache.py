@@ -0,0 +1,55 @@
+import unittest
+from typing import List
+from async_lru import alru_cache
+from app.utils.query_cache import QueryCacheKey, normalize_question
+
+
+class QueryCacheKeyTest(unittest.IsolatedAsyncioTestCase):
+    
+    def test_normalization_ignores_case_and_spacing(self):
+        self.assertEqual(normalize_question("  What is\tRAG?\n"), "what is rag?")
+        self.assertEqual(
+            QueryCacheKey.for_question("What is RAG?", 0),
+            QueryCacheKey.for_question("what  is rag?", 0)
+        )
+    
+    def test_generation_is_part_of_the_key(self):
+        self.assertNotEqual(
+            QueryCacheKey.for_question("What is RAG?", 0),
+            QueryCacheKey.for_question("What is RAG?", 1)
+        )
+    
+    async def test_cached_pipeline_sees_the_original_question(self):
+        asked: List[str] = []
+        
+        @alru_cache(maxsize=8)
+        async def answer(key: QueryCacheKey) -> str:
+            asked.append(key.question)
+            return f"answer to {key.question}"
+        
+        first = await answer(QueryCacheKey.for_question("What is HNSW?", 0))
+        second = await answer(QueryCacheKey.for_question("what is  hnsw?", 0))
+        
+        self.assertEqual(asked, ["What is HNSW?"])
+        self.assertEqual(first, second)
+    
+    async def test_new_generation_misses_and_stale_entry_can_be_dropped(self):
+        asked: List[str] = []
+        
+        @alru_cache(maxsize=8)
+        async def answer(key: QueryCacheKey) -> str:
+            asked.append(key.question)
+            return f"answer {len(asked)}"
+        
+        stale = QueryCacheKey.for_question("What is RAG?", 0)
+        await answer(stale)
+        # The cache was cleared (generation bumped) while the first query ran
+        answer.cache_invalidate(stale)
+        fresh = await answer(QueryCacheKey.for_question("What is RAG?", 1))
+        
+        self.assertEqual(fresh, "answer 2")
+        self.assertEqual(answer.cache_info().currsize, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from app.utils.semantic_cache import SemanticCache
+
+
+class SemanticCacheTest(unittest.TestCase):
+    
+    def test_near_identical_embedding_hits(self):
+        cache = SemanticCache(max_entries=4, threshold=0.95, ttl=60)
+        cache.set([1.0, 0.0, 0.0], "answer")
+        
+        # Scale does not matter; keys and lookups are unit-normalized
+        self.assertEqual(cache.get([2.0, 0.05, 0.0]), "answer")
+    
+    def test_below_threshold_misses(self):
+        cache = SemanticCache(max_entries=4, threshold=0.95, ttl=60)
+        cache.set([1.0, 0.0, 0.0], "answer")
+        
+        self.assertIsNone(cache.get([1.0, 1.0, 0.0]))
+    
+    def test_most_similar_entry_wins(self):
+        cache = SemanticCache(max_entries=4, threshold=0.5, ttl=60)
+        cache.set([1.0, 0.0, 0.0], "x")
+        cache.set([0.0, 1.0, 0.0], "y")
+        
+        self.assertEqual(cache.get([0.2, 1.0, 0.0]), "y")
+    
+    def test_expired_entries_miss(self):
+        cache = SemanticCache(max_entries=4, threshold=0.9, ttl=-1)
+        cache.set([1.0, 0.0], "stale")
+        
+        self.assertIsNone(cache.get([1.0, 0.0]))
+    
+    def test_full_cache_overwrites_oldest(self):
+        cache = SemanticCache(max_entries=2, threshold=0.99, ttl=60)
+        cache.set([1.0, 0.0, 0.0], "first")
+        cache.set([0.0, 1.0, 0.0], "second")
+        cache.set([0.0, 0.0, 1.0], "third")
+        
+        self.assertIsNone(cache.get([1.0, 0.0, 0.0]))
+        self.assertEqual(cache.get([0.0, 1.0, 0.0]), "second")
+        self.assertEqual(cache.get([0.0, 0.0, 1.0]), "third")
+    
+    def test_clear_drops_every_entry(self):
+        cache = SemanticCache(max_entries=2, threshold=0.9, ttl=60)
+        cache.set([1.0, 0.0], "answer")
+        cache.clear()
+        
+        self.assertIsNone(cache.get([1.0, 0.0]))
+    
+    def test_zero_size_stores_nothing(self):
+        # QUERY_CACHE_SIZE=0 with a semantic threshold must not break queries
+        cache = SemanticCache(max_entries=0, threshold=0.9, ttl=60)
+        
+        cache.set([1.0, 0.0], "answer")
+        
+        self.assertIsNone(cache.get([1.0, 0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()